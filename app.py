@@ -1,9 +1,24 @@
 import streamlit as st
-import pandas as pd
+import hashlib
 import json
-from ibm_watson import NaturalLanguageUnderstandingV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from ibm_watson.natural_language_understanding_v1 import Features, KeywordsOptions, EntitiesOptions, ConceptsOptions, CategoriesOptions, RelationsOptions, SentimentOptions
+import os
+import time
+# Only light modules are imported up front: pandas, numpy and the Watson SDK are imported
+# where an analysis, a results table or the corpus view first needs them, so a cold start
+# paints the input form without loading them
+from nlu_analyzer.backends import OFFLINE_MODES, backend_settings, cache_path, create_backend, isolated_path
+from nlu_analyzer.batch import BATCH_FILE_TYPES, display_frame, load_documents, results_to_frames
+from nlu_analyzer.cache import DEFAULT_CACHE_PATH, ResponseCache
+from nlu_analyzer.chunking import DEFAULT_CHUNK_BYTES
+from nlu_analyzer.export import EXPORT_FORMATS, export_zip
+from nlu_analyzer.highlight import MATCH_MODES, get_matcher, highlight
+from nlu_analyzer.jobs import BatchJobs, JobQueue, QuotaExceeded, queue_settings
+from nlu_analyzer.metrics import REGISTRY, OtlpExporter, Trace, append_jsonl
+from nlu_analyzer.pipeline import analyze, analyze_stream, feature_spec
+from nlu_analyzer.reader import iter_text, open_text, preview
+from nlu_analyzer.scheduler import RequestScheduler, scheduler_settings
+from nlu_analyzer.service import API_VERSION
+from nlu_analyzer.store import DEFAULT_STORE_PATH, AnalysisStore
 
 # Configurazione della pagina Streamlit
 st.set_page_config(page_title="IBM Watson NLU Analyzer", layout="wide")
@@ -77,26 +92,100 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Backend behind every analyze call: Watson ("live"), Watson while recording fixtures
+# ("record"), recorded fixtures ("replay") or generated responses ("synthetic"), chosen
+# with NLU_BACKEND and friends (see nlu_analyzer.backends)
+backend = backend_settings()
+offline_backend = backend["mode"] in OFFLINE_MODES
+
+# Response cache shared by every session of this process (offline backends get their own
+# cache, index and history files, so their responses never pass for Watson's; recording
+# goes without one, so each fixture holds the full request)
+@st.cache_resource
+def get_response_cache():
+    path = cache_path(DEFAULT_CACHE_PATH, backend["mode"])
+    return ResponseCache(path) if path else None
+
+response_cache = get_response_cache()
+
+# Indexed store of every analysis, queried by the "Analysis history" view
+@st.cache_resource
+def get_analysis_store():
+    return AnalysisStore(isolated_path(DEFAULT_STORE_PATH, backend["mode"]))
+
+analysis_store = get_analysis_store()
+
+# Near-duplicate index used by batch jobs, persisted next to the cache
+@st.cache_resource
+def get_dedup_index():
+    from nlu_analyzer.dedup import DEFAULT_DEDUP_PATH, NearDuplicateIndex
+    return NearDuplicateIndex(isolated_path(DEFAULT_DEDUP_PATH, backend["mode"]))
+
+# Corpus-level aggregates over every analysis of this process, seeded from the history
+# when first needed and then updated as each new response arrives; the "Corpus" tab
+# reads only these
+@st.cache_resource(show_spinner="Aggregating the analysis history...")
+def get_corpus():
+    from nlu_analyzer.corpus import CorpusAggregator
+    corpus = CorpusAggregator()
+    for analyzed_at, stored_response in get_analysis_store().iter_responses():
+        corpus.add(stored_response, analyzed_at)
+    return corpus
+
+# One NLU client per (API key, service URL), reused across reruns and sessions so the
+# IAM token and the pooled keep-alive connections survive between clicks. Changing the
+# credentials in the sidebar simply maps to a different entry.
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_nlu_client(api_key, url):
+    return create_backend(api_key, url, **backend)
+
+# Rate limit, retry policy and circuit breaker shared by every session calling the same
+# Watson instance, so concurrent users together stay within the plan's request rate
+# (NLU_RATE_LIMIT)
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_request_scheduler(api_key, url):
+    return RequestScheduler(**scheduler_settings())
+
+# Job queue and worker threads shared by every session: identical in-flight analyses are
+# coalesced and sessions take turns, so one batch cannot starve interactive users
+# (sized with NLU_QUEUE_WORKERS, NLU_QUEUE_USER_SHARE and NLU_QUEUE_USER_QUOTA)
+@st.cache_resource
+def get_job_queue():
+    return JobQueue(**queue_settings())
+
+# Sessions poll their pending jobs this often; answers arriving within JOB_INLINE_WAIT
+# of the click are shown in the same rerun
+JOB_POLL_SECONDS = 0.5
+JOB_INLINE_WAIT = 0.5
+
+# Each browser session counts as one user for the queue's fairness and quotas
+user_id = st.session_state.setdefault("user_id", os.urandom(4).hex())
+
 # Check for API credentials in Streamlit Cloud secrets or local secrets
-# This approach works both locally and on Streamlit Cloud
-try:
-    # First try Streamlit Cloud secrets
-    has_secrets = "ibm_watson" in st.secrets and "api_key" in st.secrets["ibm_watson"] and "url" in st.secrets["ibm_watson"]
-    api_key = st.secrets["ibm_watson"]["api_key"]
-    url = st.secrets["ibm_watson"]["url"]
-    use_secrets = True
-except Exception:
-    has_secrets = False
-    use_secrets = False
-    api_key = None
-    url = None
+# This approach works both locally and on Streamlit Cloud. The secrets are resolved once
+# per process (changed secrets take effect when the app restarts)
+@st.cache_resource(show_spinner=False)
+def get_secret_credentials():
+    try:
+        return st.secrets["ibm_watson"]["api_key"], st.secrets["ibm_watson"]["url"]
+    except Exception:
+        return None
+
+secret_credentials = get_secret_credentials()
+has_secrets = secret_credentials is not None
+use_secrets = has_secrets
+api_key, url = secret_credentials or (None, None)
 
 # Sidebar for API configuration
 with st.sidebar:
     st.markdown("### API Configuration")
     
-    # API Key and URL input
-    if has_secrets:
+    # API Key and URL input (not needed when replaying fixtures or generating responses)
+    if offline_backend:
+        st.info(f"Offline backend: {backend['mode']}"
+                + (f" (fixtures in {backend['fixtures']})" if backend["mode"] == "replay" else "")
+                + ". No Watson credentials are needed and no requests leave this machine.")
+    elif has_secrets:
         st.success("Using API credentials from Streamlit secrets")
         use_api_form = st.checkbox("Enter API credentials manually instead", value=False)
         
@@ -134,6 +223,9 @@ with st.sidebar:
             if instance_id:
                 url += instance_id
     
+    # Offline backends run without credentials
+    credentials_ready = bool(api_key) or offline_backend
+    
     st.markdown("### Analysis Features")
     
     # Feature selection (organized as in IBM's UI)
@@ -162,6 +254,9 @@ with st.sidebar:
                                        help="Maximum number of concepts to return.")
         categories_limit = st.number_input("Categories limit", min_value=1, max_value=10, value=3, 
                                          help="Maximum number of categories to return.")
+        chunk_bytes = st.number_input("Chunk size (bytes)", min_value=1000, max_value=DEFAULT_CHUNK_BYTES,
+                                      value=DEFAULT_CHUNK_BYTES, step=1000,
+                                      help="Longer texts are split on paragraph/sentence boundaries into chunks of at most this size, analyzed concurrently and merged.")
         language = st.selectbox("Language", options=["en", "ar", "de", "es", "fr", "it", "ja", "ko", "nl", "pt", "zh"], 
                               help="Language of the text. If not specified, the service will attempt to detect the language.")
 
@@ -169,32 +264,86 @@ with st.sidebar:
 st.markdown('<div class="panel">', unsafe_allow_html=True)
 st.markdown('<div class="panel-header">INPUT</div>', unsafe_allow_html=True)
 
-# Removed URL option as requested, keeping only Text and Text file
-text_input_method = st.radio("Select input method", ["Text", "Text file"])
+# Removed URL option as requested, keeping Text, Text file and Batch
+text_input_method = st.radio("Select input method", ["Text", "Text file", "Batch"])
+batch_mode = text_input_method == "Batch"
+uploaded_file = None
+uploaded_files = []
 
 if text_input_method == "Text":
     text_to_analyze = st.text_area("Enter text to analyze", height=150, 
                                   help="Raw text to be analyzed.")
     input_type = "text"
+elif batch_mode:
+    uploaded_files = st.file_uploader("Upload documents", type=BATCH_FILE_TYPES, accept_multiple_files=True,
+                                      help="Text files, zip archives of text files, or CSV/JSONL files with one document per row.")
+    text_to_analyze = ""
+    input_type = "batch"
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        batch_text_column = st.text_input("Text column", value="text",
+                                          help="Column (CSV) or field (JSONL) holding the document text.")
+    with col2:
+        batch_concurrency = st.number_input("Concurrent requests", min_value=1, max_value=32, value=4,
+                                            help="Number of documents analyzed in parallel.")
+    with col3:
+        # The plan's rate is shared by every session, so it is set by the operator (NLU_RATE_LIMIT)
+        rate_limit = scheduler_settings()["rate"]
+        st.text_input("Requests per second", value=f"{rate_limit:g}" if rate_limit else "Unlimited", disabled=True,
+                      help="Request rate of all sessions using these credentials together, set with "
+                           "NLU_RATE_LIMIT when the app is started.")
+    col1, col2 = st.columns(2)
+    with col1:
+        batch_dedup = st.checkbox("Skip near-duplicates", value=True,
+                                  help="Reuse the response of a near-identical document analyzed before "
+                                       "(in this or an earlier batch) instead of calling Watson.")
+    with col2:
+        batch_dedup_threshold = st.slider("Similarity threshold", min_value=0.7, max_value=1.0, value=0.9, step=0.01,
+                                          disabled=not batch_dedup,
+                                          help="Minimum share of overlapping 5-word shingles (estimated Jaccard "
+                                               "similarity) for a document to count as a near-duplicate.")
 else:
     uploaded_file = st.file_uploader("Upload a text file", type=["txt"], 
                                     help="Text file to be analyzed.")
+    text_to_analyze = ""
+    input_type = "file"
     if uploaded_file is not None:
-        text_to_analyze = uploaded_file.getvalue().decode("utf-8")
-        st.text_area("File content", text_to_analyze, height=150)
-        input_type = "text"
-    else:
-        text_to_analyze = ""
-        input_type = "text"
+        # The file is decoded incrementally at analysis time; only an excerpt is shown here,
+        # detected and decoded once per upload rather than on every rerun. The content hash
+        # identifies the input: a different file may well have the same name and size
+        file_preview = st.session_state.get("file_preview")
+        if file_preview is None or file_preview[0] != uploaded_file.file_id:
+            file_encoding, _ = open_text(uploaded_file)
+            with uploaded_file.getbuffer() as buffer:
+                file_hash = hashlib.sha256(buffer).hexdigest()
+            file_preview = (uploaded_file.file_id, file_encoding, file_hash) + preview(uploaded_file, file_encoding)
+            st.session_state["file_preview"] = file_preview
+        _, file_encoding, file_hash, preview_head, preview_tail, file_size = file_preview
+        if preview_tail:
+            st.text_area("File content (excerpt)", f"{preview_head}\n\n[…]\n\n{preview_tail}", height=150)
+        else:
+            st.text_area("File content", preview_head, height=150)
+        st.markdown(f'<div class="subtle-text">{file_size:,} bytes · {file_encoding}</div>', unsafe_allow_html=True)
 
 # Target keywords input
-target_keywords = st.text_input("Target keywords (comma-separated)", 
-                               help="Enter keywords to highlight in the results. These will be shown in green when they appear.")
+col1, col2 = st.columns([3, 1])
+with col1:
+    target_keywords = st.text_input("Target keywords (comma-separated)", 
+                                   help="Enter keywords to highlight in the results. These will be shown in green when they appear.")
+with col2:
+    target_match_mode = st.selectbox("Match", options=list(MATCH_MODES.keys()),
+                                     help="Whole word: the keyword appears as a word or phrase. Substring: anywhere in the text. "
+                                          "Stemmed: words sharing the keyword's stem (e.g. 'analyze' matches 'analyzed'). "
+                                          "Matching is always case-insensitive.")
+
+# Convert target keywords to list, clean up and normalize
+target_keywords_list = [kw.strip().lower() for kw in target_keywords.split(',') if kw.strip()]
+
+# One matcher per keyword list and mode, shared by every results table
+target_matcher = get_matcher(tuple(target_keywords_list), MATCH_MODES[target_match_mode]) if target_keywords_list else None
 
 # Display target keywords as pills if provided
 if target_keywords:
-    # Convert target keywords to list, clean up and normalize
-    target_keywords_list = [kw.strip().lower() for kw in target_keywords.split(',') if kw.strip()]
     if target_keywords_list:
         st.markdown('<div class="target-box">', unsafe_allow_html=True)
         st.markdown('<div class="target-header">TARGET KEYWORDS</div>', unsafe_allow_html=True)
@@ -210,309 +359,650 @@ st.markdown('</div>', unsafe_allow_html=True)
 # Results container
 results_container = st.container()
 
-# Execute analysis when button is clicked
-if analyze_button and text_to_analyze and api_key:
+# Optional performance exports: a JSONL log of every analysis (for tracking regressions
+# across deployments), a Prometheus textfile and an OpenTelemetry collector
+metrics_log = os.environ.get("NLU_METRICS_LOG")
+prometheus_file = os.environ.get("NLU_PROMETHEUS_FILE")
+otlp_endpoint = os.environ.get("NLU_OTLP_ENDPOINT")
+
+# Traces are sent to the collector from one background thread, never from a rerun
+@st.cache_resource
+def get_otlp_exporter(endpoint):
+    return OtlpExporter(endpoint)
+
+# Tables longer than this are shown one page at a time
+PAGE_ROWS = 500
+
+# Items per list shown in the raw JSON viewer (the download has everything)
+JSON_PREVIEW_ITEMS = 50
+
+def render_table(trace, df, match_columns, feature):
+    """Show a results table, one page at a time when long, highlighting target keywords and timing both stages."""
+    rows = len(df)
+    if rows > PAGE_ROWS:
+        pages = -(-rows // PAGE_ROWS)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"page_{feature}")
+        df = df.iloc[(page - 1) * PAGE_ROWS:page * PAGE_ROWS]
+        st.markdown(f'<div class="subtle-text">Rows {(page - 1) * PAGE_ROWS + 1}-{(page - 1) * PAGE_ROWS + len(df)} '
+                    f'of {rows}</div>', unsafe_allow_html=True)
+    shown = len(df)
+    if target_matcher and match_columns:
+        with trace.span("highlight", feature=feature, rows=shown):
+            df = highlight(df, target_matcher, match_columns)
+    with trace.span("render", feature=feature, rows=shown):
+        st.dataframe(df, use_container_width=True)
+
+def show_performance(trace):
+    """Collapsible per-stage timings of ``trace`` plus the process-wide metrics, and export the trace."""
+    performance = st.expander("Performance", key="performance", on_change="rerun")
+    if performance.open:
+        import pandas as pd
+        with performance:
+            summary = pd.DataFrame(trace.summary())
+            if not summary.empty:
+                summary["ms"] = (summary.pop("seconds") * 1000).round(1)
+                st.dataframe(summary[["stage", "count", "ms", "bytes", "rows"]], use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("Download trace (JSON)", json.dumps(trace.to_dict(), indent=2),
+                                   file_name=f"trace-{trace.trace_id}.json", mime="application/json")
+            with col2:
+                st.download_button("Download metrics (Prometheus)", REGISTRY.prometheus_text(),
+                                   file_name="metrics.prom", mime="text/plain")
+            if otlp_endpoint:
+                otlp_stats = get_otlp_exporter(otlp_endpoint).stats()
+                last_error = f' (last error: {otlp_stats["last_error"]})' if otlp_stats["last_error"] else ""
+                st.markdown(f'<div class="subtle-text">OTLP export: {otlp_stats["sent"]} sent, '
+                            f'{otlp_stats["failed"]} failed, {otlp_stats["dropped"]} dropped{last_error}</div>',
+                            unsafe_allow_html=True)
     try:
-        # Process target keywords
-        target_keywords_list = [kw.strip().lower() for kw in target_keywords.split(',') if kw.strip()]
-        
-        # Configure IBM Watson authentication
-        authenticator = IAMAuthenticator(api_key)
-        natural_language_understanding = NaturalLanguageUnderstandingV1(
-            version='2022-04-07',
-            authenticator=authenticator
-        )
-        natural_language_understanding.set_service_url(url)
+        if metrics_log:
+            append_jsonl(trace, metrics_log, deployment=os.environ.get("NLU_DEPLOYMENT"))
+        if prometheus_file:
+            REGISTRY.write_prometheus(prometheus_file)
+        if otlp_endpoint:
+            get_otlp_exporter(otlp_endpoint).submit(trace)
+    except Exception as e:
+        st.markdown(f'<div class="subtle-text">Performance export failed: {e}</div>', unsafe_allow_html=True)
+
+def export_controls(key, **data):
+    """Format picker and a download of the per-feature tables (built only when clicked)."""
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"export_format_{key}",
+                                     help="Parquet and Arrow keep types (with dictionary-encoded type/label "
+                                          "columns); CSV and NDJSON are plain text. One file per feature, zipped.")
+    with col2:
+        st.download_button("Download tables", lambda: export_zip(format=export_format, **data),
+                           file_name=f"nlu_{key}_{export_format}.zip", mime="application/zip", on_click="ignore")
+
+def result_frame(analysis, feature, trace):
+    """Table for ``feature``, built the first time its tab is opened and kept with the analysis."""
+    frames = analysis["frames"]
+    if feature not in frames:
+        items = analysis["response"][feature]
+        with trace.span("dataframe", feature=feature, rows=len(items)):
+            frames[feature] = display_frame(feature, items)
+    return frames[feature]
+
+def show_corpus(trace):
+    """Corpus-level views rendered from the precomputed aggregates (no per-document tables)."""
+    import pandas as pd
+    from nlu_analyzer.corpus import SENTIMENT_BINS
+    corpus = get_corpus()
+    corpus_stats = corpus.stats()
+    st.markdown(f'<div class="subtle-text">{corpus_stats["documents"]} documents, {corpus_stats["mentions"]} '
+                f'mentions, {corpus_stats["entities"]} entities and {corpus_stats["keywords"]} keywords tracked</div>',
+                unsafe_allow_html=True)
+    if not corpus_stats["documents"]:
+        st.info("Analyze some documents to build corpus-level views.")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        corpus_kind = st.selectbox("Terms", ["entities", "keywords"], format_func=str.title, key="corpus_kind")
+    with col2:
+        corpus_rank = st.selectbox("Rank by", ["documents", "mentions", "relevance"], format_func=str.title,
+                                   key="corpus_rank", help="Documents mentioning the term, total mentions, or "
+                                                           "relevance summed over documents.")
+    with trace.span("corpus", feature=corpus_kind):
+        top_terms = pd.DataFrame(corpus.top_terms(corpus_kind, 50, by=corpus_rank))
+        sentiment = pd.DataFrame(corpus.sentiment_distribution(corpus_kind, 15))
+    st.markdown("#### Frequency across documents")
+    if top_terms.empty:
+        st.info(f"No {corpus_kind} in the analyzed documents.")
+    else:
+        render_table(trace, top_terms, ["text"], f"corpus_{corpus_kind}")
+    st.markdown("#### Sentiment distribution")
+    if not sentiment.empty and sentiment[SENTIMENT_BINS].to_numpy().sum():
+        st.bar_chart(sentiment.set_index("text")[SENTIMENT_BINS])
+    else:
+        st.info(f"No sentiment scores for these {corpus_kind}.")
+
+    st.markdown("#### Entity co-occurrence")
+    with trace.span("corpus", feature="cooccurrence"):
+        pairs = pd.DataFrame(corpus.cooccurrence(30))
+        labels, matrix = corpus.cooccurrence_matrix(15)
+    if pairs.empty:
+        st.info("No entities mentioned together yet.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.dataframe(pairs, use_container_width=True)
+        with col2:
+            st.dataframe(pd.DataFrame(matrix, index=labels, columns=labels), use_container_width=True)
+
+    st.markdown("#### Category trends")
+    trends = pd.DataFrame(corpus.category_trends(8))
+    if trends.empty:
+        st.info("No categories in the analyzed documents.")
+    else:
+        trends["day"] = pd.to_datetime(trends["day"], unit="s")
+        st.line_chart(trends.pivot(index="day", columns="category", values="documents"))
+
+def json_preview(value):
+    """Copy of a response with every list cut to ``JSON_PREVIEW_ITEMS`` items."""
+    if isinstance(value, dict):
+        return {key: json_preview(item) for key, item in value.items()}
+    if isinstance(value, list):
+        preview_items = [json_preview(item) for item in value[:JSON_PREVIEW_ITEMS]]
+        if len(value) > JSON_PREVIEW_ITEMS:
+            preview_items.append(f"... {len(value) - JSON_PREVIEW_ITEMS} more")
+        return preview_items
+    return value
+
+# Prepare features to analyze (plain dicts, so they can be part of the cache key)
+enabled_features = [name for name, enabled in [
+    ("keywords", analyze_keywords),
+    ("entities", analyze_entities),
+    ("concepts", analyze_concepts),
+    ("categories", analyze_categories),
+    ("relations", analyze_relations),
+] if enabled]
+features = feature_spec(enabled_features, {
+    "keywords": keywords_limit,
+    "entities": entities_limit,
+    "concepts": concepts_limit,
+    "categories": categories_limit,
+})
+
+# Results live in session state, so reruns caused by switching tabs or pages render them
+# again without calling Watson. Once a text has been analyzed, changing sidebar options
+# re-runs the analysis on the same input automatically; cached features are reused and
+# only new ones are requested
+if text_to_analyze:
+    input_fingerprint = hashlib.sha256(text_to_analyze.encode("utf-8")).hexdigest()
+elif uploaded_file is not None:
+    input_fingerprint = file_hash
+else:
+    input_fingerprint = None
+analysis_request = {"features": features, "language": language, "chunk_bytes": chunk_bytes}
+analysis = st.session_state.get("analysis")
+if batch_mode or analysis is None or analysis["input"] != input_fingerprint:
+    analysis = None
+
+# Analyses run on the process-wide job queue: the session submits a job and picks up its
+# result on a later rerun instead of blocking its script thread. A job still pending for
+# an input that is no longer shown is left to finish and ignored
+pending_analysis = st.session_state.get("pending_analysis")
+if pending_analysis is not None and (batch_mode or pending_analysis["input"] != input_fingerprint):
+    pending_analysis = None
+    st.session_state.pop("pending_analysis")
+latest_request = (pending_analysis or analysis or {}).get("request")
+reanalyze = not analyze_button and latest_request is not None and latest_request != analysis_request
+render_trace = None
+
+def job_key(content, request):
+    """Coalescing key of a job: the same content and options sent to the same Watson instance."""
+    payload = json.dumps([content, request, url, backend["mode"]], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def collect_batch(batch_job):
+    """Store the documents of a queued batch that finished since the last poll."""
+    for result in batch_job["jobs"].poll():
+        batch_job["results"].append(result)
+        if result.error is None:
+            analysis_store.save(batch_job["store_run"], result.doc_id, result.response)
+            batch_job["corpus"].add(result.response)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_batch_progress(batch_job):
+    """Progress of a queued batch, refreshed on its own until the batch is done."""
+    try:
+        collect_batch(batch_job)
+    except Exception:
+        st.rerun()
+    if batch_job["jobs"].done:
+        st.rerun()
+    analyzed = len(batch_job["results"])
+    # The uploads are read once, by the batch itself, so the total is known only once they all are
+    total = batch_job["jobs"].total
+    if total is None:
+        st.markdown(f'<div class="subtle-text">Analyzed {analyzed} documents so far</div>', unsafe_allow_html=True)
+        return
+    st.progress(analyzed / max(total, 1))
+    st.markdown(f'<div class="subtle-text">Analyzed {analyzed} of {total} documents</div>',
+                unsafe_allow_html=True)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_status(job):
+    """Queue position or running time of a pending analysis, until it is done."""
+    if job.done():
+        st.rerun()
+    if job.status == "queued":
+        st.info(f"Queued behind {get_job_queue().position(job)} jobs ({time.time() - job.submitted_at:.1f} s)")
+    else:
+        st.info(f"Analyzing... ({time.time() - job.started_at:.1f} s)")
+
+# Execute batch analysis when button is clicked in batch mode
+if analyze_button and batch_mode and uploaded_files and credentials_ready:
+    try:
+        # One authenticated client shared by every worker thread
+        natural_language_understanding = get_nlu_client(api_key, url)
+
+        def documents():
+            for uploaded in uploaded_files:
+                yield from load_documents(uploaded.name, uploaded.getvalue(), batch_text_column)
+
+        # One token bucket throttles every request to this Watson instance, batches included
+        request_scheduler = get_request_scheduler(api_key, url)
+        trace = Trace("batch")
+
+        dedup_index = get_dedup_index() if batch_dedup else None
+        from nlu_analyzer.dedup import request_namespace
+        dedup_namespace = request_namespace(features, language, API_VERSION)
+        duplicates = []
+
+        def analyze_text(text):
+            # Worker threads record their requests into this batch's trace
+            with trace.activate():
+                return analyze(text, features, language=language, client=natural_language_understanding,
+                               cache=response_cache, max_bytes=chunk_bytes, scheduler=request_scheduler).response
+
+        def analyze_document(text):
+            if dedup_index is None:
+                return analyze_text(text)
+            response, match = dedup_index.analyze(text, dedup_namespace, analyze_text, batch_dedup_threshold)
+            if match is not None:
+                duplicates.append(match)
+            return response
+
+        batch_request = [dedup_namespace, chunk_bytes, batch_dedup and batch_dedup_threshold]
+        st.session_state.pop("batch_results", None)
+        batch_job = {"results": [], "trace": trace, "duplicates": duplicates,
+                     # Seeded from the history before this batch is stored, so it is counted once
+                     "corpus": get_corpus(), "store_run": analysis_store.start_run(features, language),
+                     "jobs": BatchJobs(get_job_queue(), user_id, analyze_document, documents(),
+                                       key_fn=lambda text: job_key(hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                                                                   batch_request),
+                                       window=2 * int(batch_concurrency), limit=int(batch_concurrency))}
+        st.session_state["batch_job"] = batch_job
+
+    except Exception as e:
+        st.session_state.pop("batch_results", None)
+        st.session_state.pop("batch_job", None)
+        st.error(f"An error occurred: {str(e)}")
+        st.markdown(f"<div class='json-box'>Error details: {str(e)}</div>", unsafe_allow_html=True)
+
+# Submit an analysis when button is clicked (or options changed after an analysis)
+elif (analyze_button or reanalyze) and (text_to_analyze or uploaded_file is not None) and credentials_ready:
+    try:
+        from nlu_analyzer.client import timed_call
+        trace = Trace()
+
+        # Reuse the authenticated client (built on first use for these credentials)
+        client_start = time.perf_counter()
+        natural_language_understanding = get_nlu_client(api_key, url)
+        client_seconds = time.perf_counter() - client_start
+        trace.add("client", client_seconds)
+        request_scheduler = get_request_scheduler(api_key, url)
+
+        def run_analysis(uploaded_file=uploaded_file, file_encoding=file_encoding if uploaded_file is not None else None,
+                         text=text_to_analyze, features=features, language=language, chunk_bytes=chunk_bytes):
+            # API call (served from the response cache when the same request was made before)
+            with trace.activate():
+                if uploaded_file is not None:
+                    # Stream the upload straight into the chunked analysis path
+                    result, timings = timed_call(natural_language_understanding, analyze_stream,
+                                                 iter_text(uploaded_file, file_encoding), features,
+                                                 language=language, client=natural_language_understanding,
+                                                 cache=response_cache, max_bytes=chunk_bytes,
+                                                 scheduler=request_scheduler)
+                else:
+                    result, timings = timed_call(natural_language_understanding, analyze, text, features,
+                                                 language=language, client=natural_language_understanding,
+                                                 cache=response_cache, max_bytes=chunk_bytes,
+                                                 scheduler=request_scheduler)
+            trace.add("auth", timings["token"])
+            trace.add("connect", timings["connect"], connections=timings["connections"])
+            trace.add("analyze", timings["analyze"], characters=result.statistics["characters"])
+            return result, timings, trace
+
+        # Identical pending requests of other sessions (same text or file content) share the job
+        job = get_job_queue().submit(user_id, job_key(input_fingerprint, analysis_request), run_analysis)
+        pending_analysis = {"job": job, "input": input_fingerprint, "request": analysis_request,
+                            "new_run": analyze_button, "client_seconds": client_seconds,
+                            "doc_id": uploaded_file.name if uploaded_file is not None else f"text-{input_fingerprint[:12]}"}
+        st.session_state["pending_analysis"] = pending_analysis
+        # Quick answers (e.g. from the response cache) are shown in this rerun
+        job.wait(JOB_INLINE_WAIT)
+
+    except QuotaExceeded as e:
+        st.warning(f"Too many analyses queued for this session, try again shortly: {e}")
+    except Exception as e:
+        analysis = None
+        st.session_state.pop("analysis", None)
+        st.error(f"An error occurred: {str(e)}")
+        st.markdown(f"<div class='json-box'>Error details: {str(e)}</div>", unsafe_allow_html=True)
+
+# Pick up a finished batch; while documents are outstanding, its progress refreshes on its own
+batch_job = st.session_state.get("batch_job") if batch_mode and uploaded_files else None
+if batch_job is not None:
+    try:
+        collect_batch(batch_job)
+        if batch_job["jobs"].done:
+            st.session_state.pop("batch_job")
+            trace = batch_job["trace"]
+            results = batch_job["results"]
+            duplicates = batch_job["duplicates"]
+            with trace.span("dataframe", feature="batch") as span:
+                frames = results_to_frames(results)
+                span["rows"] = sum(len(frame) for frame in frames.values())
+            st.session_state["batch_results"] = {"frames": frames, "documents": len(results),
+                                                 "duplicates": len(duplicates),
+                                                 "units_saved": sum(match.units for match in duplicates)}
+            render_trace = trace
+        else:
+            with results_container:
+                show_batch_progress(batch_job)
+    except Exception as e:
+        st.session_state.pop("batch_job", None)
+        st.error(f"An error occurred: {str(e)}")
+        st.markdown(f"<div class='json-box'>Error details: {str(e)}</div>", unsafe_allow_html=True)
+
+# Pick up a finished analysis; while it is queued or running, its status refreshes on its own
+if pending_analysis is not None and pending_analysis["job"].done():
+    st.session_state.pop("pending_analysis")
+    try:
+        result, timings, trace = pending_analysis["job"].result()
+        response = result.response
+
+        # Persist the response; re-analyses after option changes replace it within the same run
+        corpus = get_corpus()
+        if pending_analysis["new_run"] or "store_run" not in st.session_state:
+            st.session_state["store_run"] = analysis_store.start_run(pending_analysis["request"]["features"],
+                                                                     pending_analysis["request"]["language"])
+        doc_id = pending_analysis["doc_id"]
+        analysis_store.save(st.session_state["store_run"], doc_id, response, result.statistics)
+        if pending_analysis["new_run"]:
+            # Re-analyses replace a stored response, but aggregates cannot be taken back
+            corpus.add(response)
+
+        # DataFrames are added to "frames" as their tabs are opened
+        analysis = {"input": pending_analysis["input"], "request": pending_analysis["request"], "doc_id": doc_id,
+                    "response": response, "statistics": result.statistics,
+                    "timings": dict(timings, client=pending_analysis["client_seconds"]), "frames": {}}
+        st.session_state["analysis"] = analysis
+        render_trace = trace
+
+    except Exception as e:
+        analysis = None
+        st.session_state.pop("analysis", None)
+        st.error(f"An error occurred: {str(e)}")
+        st.markdown(f"<div class='json-box'>Error details: {str(e)}</div>", unsafe_allow_html=True)
+elif pending_analysis is not None:
+    with results_container:
+        show_job_status(pending_analysis["job"])
+
+# Batch results, one lazily rendered tab per feature
+batch_results = st.session_state.get("batch_results") if batch_mode and uploaded_files else None
+if batch_results is not None:
+    trace = render_trace or Trace("rerun")
+    frames = batch_results["frames"]
+    failed = len(frames["errors"])
+    with results_container:
+        if failed:
+            st.warning(f"Batch completed: {batch_results['documents'] - failed} documents analyzed, {failed} failed")
+        else:
+            st.success(f"Batch completed: {batch_results['documents']} documents analyzed")
+        if batch_results["duplicates"]:
+            st.markdown(f'<div class="subtle-text">{batch_results["duplicates"]} near-duplicate documents reused an '
+                        f'earlier response, saving {batch_results["duplicates"]} calls and '
+                        f'{batch_results["units_saved"]} text units</div>', unsafe_allow_html=True)
+
+        # Columns checked for target keywords in each table
+        match_columns = {"keywords": ["text"], "entities": ["text"], "concepts": ["text"],
+                         "categories": ["Category"], "relations": ["Elements", "Sentence"], "errors": []}
+        batch_tabs = st.tabs(["Keywords", "Entities", "Concepts", "Categories", "Relations", "Errors", "Corpus"],
+                             key="batch_tabs", on_change="rerun")
+        for tab, feature in zip(batch_tabs, ["keywords", "entities", "concepts", "categories", "relations", "errors"]):
+            if not tab.open:
+                continue
+            with tab:
+                if frames[feature].empty:
+                    st.info(f"No {feature} in the batch results.")
+                else:
+                    render_table(trace, frames[feature], match_columns[feature], feature)
+        if batch_tabs[-1].open:
+            with batch_tabs[-1]:
+                show_corpus(trace)
+        export_controls("batch", frames=frames)
+        show_performance(trace)
+
+# Single-document results; only the open tab's table is built and rendered
+elif analysis is not None:
+    trace = render_trace or Trace("rerun")
+    response = analysis["response"]
+    timings = analysis["timings"]
+    with results_container:
+        st.success("Analysis completed successfully")
         
-        # Prepare features to analyze
-        features = {}
+        # Add text stats
+        st.markdown('<div class="stats-box">', unsafe_allow_html=True)
+        st.markdown('<div class="stats-header">TEXT STATISTICS</div>', unsafe_allow_html=True)
         
-        if analyze_keywords:
-            features["keywords"] = KeywordsOptions(sentiment=True, emotion=False, limit=keywords_limit)
+        # Counts and readability from the streaming statistics engine
+        statistics = analysis["statistics"]
         
-        if analyze_entities:
-            features["entities"] = EntitiesOptions(sentiment=True, emotion=False, limit=entities_limit)
+        # Display stats
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown(f'<div class="stats-item">Words: {statistics["words"]}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="stats-item">Paragraphs: {statistics["paragraphs"]}</div>', unsafe_allow_html=True)
+        with col2:
+            st.markdown(f'<div class="stats-item">Sentences: {statistics["sentences"]}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="stats-item">Unique Terms: {statistics["unique_terms"]}</div>', unsafe_allow_html=True)
+        with col3:
+            st.markdown(f'<div class="stats-item">Characters: {statistics["characters"]}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="stats-item">Avg. Sentence Length: {statistics["avg_sentence_length"]} words</div>', unsafe_allow_html=True)
+        if statistics["reading_ease"] is not None:
+            readability = f'Reading Ease: {statistics["reading_ease"]}'
+            if statistics["grade_level"] is not None:
+                readability += f' &middot; Grade Level: {statistics["grade_level"]}'
+            st.markdown(f'<div class="stats-item">{readability}</div>', unsafe_allow_html=True)
         
-        if analyze_concepts:
-            features["concepts"] = ConceptsOptions(limit=concepts_limit)
+        # Display detected language if available
+        if "language" in response:
+            st.markdown(f'<div class="stats-item">Detected Language: {response["language"].upper()}</div>', unsafe_allow_html=True)
         
-        if analyze_categories:
-            features["categories"] = CategoriesOptions(limit=categories_limit)
-            
-        if analyze_relations:
-            features["relations"] = RelationsOptions()
+        st.markdown('</div>', unsafe_allow_html=True)
         
-        # Configure input based on type
-        params = {
-            "features": Features(**features),
-            "language": language
-        }
+        # Request timing: client setup, IAM token, new connections and the analyze round trip
+        st.markdown('<div class="stats-box">', unsafe_allow_html=True)
+        st.markdown('<div class="stats-header">REQUEST TIMING</div>', unsafe_allow_html=True)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(f'<div class="stats-item">Client: {timings["client"] * 1000:.0f} ms</div>', unsafe_allow_html=True)
+        with col2:
+            st.markdown(f'<div class="stats-item">Token: {timings["token"] * 1000:.0f} ms</div>', unsafe_allow_html=True)
+        with col3:
+            st.markdown(f'<div class="stats-item">Connect: {timings["connect"] * 1000:.0f} ms '
+                        f'({timings["connections"]} new)</div>', unsafe_allow_html=True)
+        with col4:
+            st.markdown(f'<div class="stats-item">Analyze: {timings["analyze"] * 1000:.0f} ms</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
         
-        if input_type == "text":
-            params["text"] = text_to_analyze
+        # Main tabs as in IBM's interface; a tab switch reruns the script so that only
+        # the open tab's content is computed
+        main_tabs = st.tabs(["Extraction", "Classification", "Linguistics", "Custom", "Corpus"], key="main_tabs",
+                            on_change="rerun")
         
-        # API call
-        with st.spinner("Analyzing..."):
-            response = natural_language_understanding.analyze(**params).get_result()
-            
-            with results_container:
-                st.success("Analysis completed successfully")
-                
-                # Add text stats
-                st.markdown('<div class="stats-box">', unsafe_allow_html=True)
-                st.markdown('<div class="stats-header">TEXT STATISTICS</div>', unsafe_allow_html=True)
-                
-                # Count words, sentences, and characters
-                word_count = len(text_to_analyze.split())
-                sentence_count = text_to_analyze.count('.') + text_to_analyze.count('!') + text_to_analyze.count('?')
-                char_count = len(text_to_analyze)
-                
-                # Display stats
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.markdown(f'<div class="stats-item">Words: {word_count}</div>', unsafe_allow_html=True)
-                with col2:
-                    st.markdown(f'<div class="stats-item">Sentences: {sentence_count}</div>', unsafe_allow_html=True)
-                with col3:
-                    st.markdown(f'<div class="stats-item">Characters: {char_count}</div>', unsafe_allow_html=True)
-                
-                # Display detected language if available
-                if "language" in response:
-                    st.markdown(f'<div class="stats-item">Detected Language: {response["language"].upper()}</div>', unsafe_allow_html=True)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Main tabs as in IBM's interface
-                main_tabs = st.tabs(["Extraction", "Classification", "Linguistics", "Custom"])
-                
-                with main_tabs[0]:  # Extraction tab
-                    if analyze_keywords or analyze_entities or analyze_concepts or analyze_relations:
-                        # Subtabs for extraction types
-                        extraction_tabs = st.tabs(["Entities", "Keywords", "Concepts", "Relations"])
-                        
-                        # Entities tab
-                        with extraction_tabs[0]:
-                            if analyze_entities and "entities" in response:
-                                entities_df = pd.DataFrame(response["entities"])
-                                if not entities_df.empty:
-                                    # Simplify dataframe to show only relevant columns
-                                    display_cols = ["text", "type", "relevance"]
-                                    if "sentiment" in entities_df.columns:
-                                        entities_df["sentiment_score"] = entities_df["sentiment"].apply(
-                                            lambda x: x.get("score", 0) if isinstance(x, dict) else 0
-                                        )
-                                        display_cols.append("sentiment_score")
-                                    
-                                    # Sort and display
-                                    entities_df = entities_df.sort_values(by="relevance", ascending=False)
-                                    
-                                    # For entities that match target keywords, apply style
-                                    if target_keywords_list:
-                                        # Check if entities match any target keywords
-                                        def highlight_target_entities(row):
-                                            text = row['text'].lower()
-                                            for kw in target_keywords_list:
-                                                if kw == text or kw in text.split():
-                                                    return ['highlight-green'] * len(row)
-                                            return [''] * len(row)
-                                        
-                                        # Apply styling
-                                        st.dataframe(
-                                            entities_df[display_cols].style.apply(highlight_target_entities, axis=1),
-                                            use_container_width=True
-                                        )
-                                    else:
-                                        st.dataframe(entities_df[display_cols], use_container_width=True)
-                                else:
-                                    st.info("No entities found in the analyzed text.")
-                            else:
-                                st.info("Enable the Entities option in the sidebar to view entity analysis results.")
-                        
-                        # Keywords tab
-                        with extraction_tabs[1]:
-                            if analyze_keywords and "keywords" in response:
-                                keywords_df = pd.DataFrame(response["keywords"])
-                                if not keywords_df.empty:
-                                    # Simplify dataframe
-                                    if "sentiment" in keywords_df.columns:
-                                        keywords_df["sentiment_score"] = keywords_df["sentiment"].apply(
-                                            lambda x: x.get("score", 0) if isinstance(x, dict) else 0
-                                        )
-                                    
-                                    # Sort and display
-                                    keywords_df = keywords_df.sort_values(by="relevance", ascending=False)
-                                    display_cols = ["text", "relevance"]
-                                    if "sentiment_score" in keywords_df.columns:
-                                        display_cols.append("sentiment_score")
-                                    
-                                    # For keywords that match target keywords, apply style
-                                    if target_keywords_list:
-                                        # Check if keywords match any target keywords
-                                        def highlight_target_keywords(row):
-                                            text = row['text'].lower()
-                                            for kw in target_keywords_list:
-                                                if kw == text or kw in text.split():
-                                                    return ['highlight-green'] * len(row)
-                                            return [''] * len(row)
-                                        
-                                        # Apply styling
-                                        st.dataframe(
-                                            keywords_df[display_cols].style.apply(highlight_target_keywords, axis=1),
-                                            use_container_width=True
-                                        )
-                                    else:
-                                        st.dataframe(keywords_df[display_cols], use_container_width=True)
-                                else:
-                                    st.info("No keywords found in the analyzed text.")
-                            else:
-                                st.info("Enable the Keywords option in the sidebar to view keyword analysis results.")
-                        
-                        # Concepts tab
-                        with extraction_tabs[2]:
-                            if analyze_concepts and "concepts" in response:
-                                concepts_df = pd.DataFrame(response["concepts"])
-                                if not concepts_df.empty:
-                                    # Sort and display
-                                    concepts_df = concepts_df.sort_values(by="relevance", ascending=False)
-                                    
-                                    # For concepts that match target keywords, apply style
-                                    if target_keywords_list:
-                                        # Check if concepts match any target keywords
-                                        def highlight_target_concepts(row):
-                                            text = row['text'].lower()
-                                            for kw in target_keywords_list:
-                                                if kw == text or kw in text.split():
-                                                    return ['highlight-green'] * len(row)
-                                            return [''] * len(row)
-                                        
-                                        # Apply styling
-                                        st.dataframe(
-                                            concepts_df[["text", "relevance"]].style.apply(highlight_target_concepts, axis=1),
-                                            use_container_width=True
-                                        )
-                                    else:
-                                        st.dataframe(concepts_df[["text", "relevance"]], use_container_width=True)
+        if main_tabs[0].open:
+            with main_tabs[0]:  # Extraction tab
+                if analyze_keywords or analyze_entities or analyze_concepts or analyze_relations:
+                    # Subtabs for extraction types
+                    extraction_tabs = st.tabs(["Entities", "Keywords", "Concepts", "Relations"],
+                                              key="extraction_tabs", on_change="rerun")
+                    extraction_features = [
+                        ("entities", analyze_entities, ["text"], "entity"),
+                        ("keywords", analyze_keywords, ["text"], "keyword"),
+                        ("concepts", analyze_concepts, ["text"], "concept"),
+                        ("relations", analyze_relations, ["Elements", "Sentence"], "relation"),
+                    ]
+                    for tab, (feature, enabled, match_columns, singular) in zip(extraction_tabs, extraction_features):
+                        if not tab.open:
+                            continue
+                        with tab:
+                            if enabled and feature in response:
+                                feature_df = result_frame(analysis, feature, trace)
+                                if not feature_df.empty:
+                                    render_table(trace, feature_df, match_columns, feature)
                                 else:
-                                    st.info("No concepts found in the analyzed text.")
+                                    st.info(f"No {feature} found in the analyzed text.")
                             else:
-                                st.info("Enable the Concepts option in the sidebar to view concept analysis results.")
-                        
-                        # Relations tab
-                        with extraction_tabs[3]:
-                            if analyze_relations and "relations" in response:
-                                relations = response["relations"]
-                                if relations:
-                                    relations_data = []
-                                    for rel in relations:
-                                        relation_type = rel.get("type", "")
-                                        sentence = rel.get("sentence", "")
-                                        score = rel.get("score", 0)
-                                        
-                                        # Extract entities involved in the relation
-                                        arguments = []
-                                        for arg in rel.get("arguments", []):
-                                            entity_text = arg.get("text", "")
-                                            entity_type = ""
-                                            entities = arg.get("entities", [])
-                                            if entities and len(entities) > 0:
-                                                entity_type = entities[0].get("type", "")
-                                            arguments.append(f"{entity_text} ({entity_type})")
-                                        
-                                        relation_args = " → ".join(arguments)
-                                        relations_data.append({
-                                            "Relation Type": relation_type,
-                                            "Elements": relation_args,
-                                            "Sentence": sentence,
-                                            "Confidence": score
-                                        })
-                                    
-                                    relations_df = pd.DataFrame(relations_data)
-                                    
-                                    # Highlight relations that contain target keywords
-                                    if target_keywords_list:
-                                        def highlight_target_relations(row):
-                                            elements = row['Elements'].lower()
-                                            sentence = row['Sentence'].lower() if isinstance(row['Sentence'], str) else ""
-                                            
-                                            for kw in target_keywords_list:
-                                                if kw in elements or kw in sentence:
-                                                    return ['highlight-green'] * len(row)
-                                            return [''] * len(row)
-                                        
-                                        # Apply styling
-                                        st.dataframe(
-                                            relations_df.style.apply(highlight_target_relations, axis=1),
-                                            use_container_width=True
-                                        )
-                                    else:
-                                        st.dataframe(relations_df, use_container_width=True)
-                                else:
-                                    st.info("No relations found in the analyzed text.")
-                            else:
-                                st.info("Enable the Relations option in the sidebar to view relation analysis results.")
-                    else:
-                        st.info("Select at least one extraction option in the sidebar.")
-                
-                with main_tabs[1]:  # Classification tab
-                    if analyze_categories and "categories" in response:
-                        categories_df = pd.DataFrame(response["categories"])
-                        if not categories_df.empty:
-                            # Rename columns for better clarity
-                            if "label" in categories_df.columns and "score" in categories_df.columns:
-                                categories_df = categories_df.rename(columns={"label": "Category", "score": "Confidence"})
-                            
-                            # Highlight categories that contain target keywords
-                            if target_keywords_list:
-                                def highlight_target_categories(row):
-                                    category = row['Category'].lower() if isinstance(row['Category'], str) else ""
-                                    
-                                    for kw in target_keywords_list:
-                                        if kw in category:
-                                            return ['highlight-green'] * len(row)
-                                    return [''] * len(row)
-                                
-                                # Apply styling
-                                st.dataframe(
-                                    categories_df.style.apply(highlight_target_categories, axis=1),
-                                    use_container_width=True
-                                )
-                            else:
-                                st.dataframe(categories_df, use_container_width=True)
-                        else:
-                            st.info("No categories found in the analyzed text.")
+                                st.info(f"Enable the {feature.title()} option in the sidebar to view "
+                                        f"{singular} analysis results.")
+                else:
+                    st.info("Select at least one extraction option in the sidebar.")
+        
+        if main_tabs[1].open:
+            with main_tabs[1]:  # Classification tab
+                if analyze_categories and "categories" in response:
+                    categories_df = result_frame(analysis, "categories", trace)
+                    if not categories_df.empty:
+                        render_table(trace, categories_df, ["Category"], "categories")
                     else:
-                        st.info("Enable the Categories option in the sidebar to view classification results.")
-                
-                with main_tabs[2]:  # Linguistics tab
-                    st.info("To enable linguistic analysis, select the corresponding options in the sidebar.")
-                
-                with main_tabs[3]:  # Custom tab
-                    st.info("To use custom models, configure the appropriate settings in the sidebar.")
-                
-                # Raw JSON results
-                st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
-                st.markdown("### API Response")
+                        st.info("No categories found in the analyzed text.")
+                else:
+                    st.info("Enable the Categories option in the sidebar to view classification results.")
+        
+        if main_tabs[2].open:
+            with main_tabs[2]:  # Linguistics tab
+                st.info("To enable linguistic analysis, select the corresponding options in the sidebar.")
+        
+        if main_tabs[3].open:
+            with main_tabs[3]:  # Custom tab
+                st.info("To use custom models, configure the appropriate settings in the sidebar.")
+        
+        if main_tabs[4].open:
+            with main_tabs[4]:  # Corpus tab, across every analyzed document
+                show_corpus(trace)
+        
+        # Raw JSON results, serialized only when the expander is opened
+        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+        st.markdown("### API Response")
+        
+        raw_json = st.expander("View raw JSON response", key="raw_json", on_change="rerun")
+        if raw_json.open:
+            with raw_json:
+                st.markdown('<div class="json-box">', unsafe_allow_html=True)
+                with trace.span("render", feature="raw_json"):
+                    st.json(json_preview(response))
+                st.markdown('</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="subtle-text">Lists are cut to {JSON_PREVIEW_ITEMS} items; '
+                            f'the download has the full response.</div>', unsafe_allow_html=True)
                 
-                with st.expander("View raw JSON response"):
-                    st.markdown('<div class="json-box">', unsafe_allow_html=True)
-                    st.json(response)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Add copy to clipboard button
-                    if st.button("Copy JSON to clipboard"):
-                        st.code(json.dumps(response, indent=2))
-                        st.success("JSON copied to clipboard!")
-    
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
-        st.markdown(f"<div class='json-box'>Error details: {str(e)}</div>", unsafe_allow_html=True)
+                # The full JSON is only serialized when the download is clicked
+                st.download_button("Download JSON", lambda: json.dumps(response, indent=2, ensure_ascii=False),
+                                   file_name="nlu_response.json", mime="application/json", on_click="ignore")
+        
+        export_controls("results", responses=[(analysis["doc_id"], response)])
+        show_performance(trace)
+
+elif analyze_button and batch_mode and not uploaded_files:
+    st.warning("Please upload documents to analyze")
 
-elif analyze_button and not text_to_analyze:
+elif analyze_button and not (text_to_analyze or uploaded_file is not None):
     st.warning("Please enter text to analyze")
 
-elif analyze_button and not api_key:
+elif analyze_button and not credentials_ready:
     st.warning("Please enter your IBM Watson NLU API Key")
 
+# Query view over the stored analyses (answered from the local index, no Watson calls),
+# queried only while the expander is open
+history = st.expander("Analysis history", key="history", on_change="rerun")
+if history.open:
+    with history:
+        store_counts = analysis_store.counts()
+        st.markdown(f'<div class="subtle-text">{store_counts["documents"]} documents from {store_counts["runs"]} runs</div>',
+                    unsafe_allow_html=True)
+        history_query = st.selectbox("Query", ["Documents mentioning an entity", "Top categories", "Top entities",
+                                               "Top keywords"])
+        history_periods = {"Last 24 hours": 24 * 3600, "Last 7 days": 7 * 24 * 3600, "Last 30 days": 30 * 24 * 3600,
+                           "All time": None}
+        history_period = st.selectbox("Period", list(history_periods.keys()), index=1)
+        history_since = time.time() - history_periods[history_period] if history_periods[history_period] else None
+
+        query_start = time.perf_counter()
+        if history_query == "Documents mentioning an entity":
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                history_entity = st.text_input("Entity", help="Entity text (case-insensitive).")
+            with col2:
+                history_entity_type = st.text_input("Entity type", help="Optional, e.g. Person or Organization.")
+            with col3:
+                history_negative = st.checkbox("Negative sentiment only", help="Only mentions with a sentiment score below 0.")
+            history_rows = analysis_store.documents_mentioning(
+                history_entity.strip(), history_entity_type.strip() or None,
+                max_sentiment=0 if history_negative else None, since=history_since
+            ) if history_entity.strip() else []
+        elif history_query == "Top categories":
+            history_rows = analysis_store.top_categories(since=history_since)
+        elif history_query == "Top entities":
+            history_rows = analysis_store.top_entities(since=history_since)
+        else:
+            history_rows = analysis_store.top_keywords(since=history_since)
+        query_ms = (time.perf_counter() - query_start) * 1000
+
+        if history_rows:
+            import pandas as pd
+            history_df = pd.DataFrame(history_rows)
+            if "analyzed_at" in history_df.columns:
+                history_df["analyzed_at"] = pd.to_datetime(history_df["analyzed_at"], unit="s")
+            st.dataframe(history_df, use_container_width=True)
+        else:
+            st.info("No stored analyses match this query.")
+        st.markdown(f'<div class="subtle-text">Answered from the local index in {query_ms:.1f} ms</div>',
+                    unsafe_allow_html=True)
+
+# Job queue of this process for operators: open the app with ?admin=1
+if st.query_params.get("admin"):
+    queue_view = st.expander("Job queue", key="job_queue", on_change="rerun")
+    if queue_view.open:
+        with queue_view:
+            queue_stats = get_job_queue().stats()
+            st.markdown('<div class="stats-box">', unsafe_allow_html=True)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown(f'<div class="stats-item">Queued: {queue_stats["queued"]}</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="stats-item">Running: {queue_stats["running"]} of {queue_stats["workers"]} '
+                            f'workers</div>', unsafe_allow_html=True)
+            with col2:
+                if queue_stats["wait_p50"] is not None:
+                    st.markdown(f'<div class="stats-item">Wait p50 / p95: {queue_stats["wait_p50"] * 1000:.0f} / '
+                                f'{queue_stats["wait_p95"] * 1000:.0f} ms</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="stats-item">Completed: {queue_stats["completed"]} '
+                            f'({queue_stats["failed"]} failed)</div>', unsafe_allow_html=True)
+            with col3:
+                st.markdown(f'<div class="stats-item">Coalesced: {queue_stats["coalesced"]} of '
+                            f'{queue_stats["submitted"]} ({queue_stats["coalescing_rate"]:.0%})</div>',
+                            unsafe_allow_html=True)
+                st.markdown(f'<div class="stats-item">Rejected (quota): {queue_stats["rejected"]}</div>',
+                            unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+            if queue_stats["users"]:
+                st.dataframe(queue_stats["users"], use_container_width=True)
+            st.button("Refresh", key="job_queue_refresh")
+
 # Instructions for Streamlit Cloud secrets
 if not has_secrets:
     with st.expander("How to set up secrets in Streamlit Cloud"):
@@ -537,6 +1027,48 @@ if not has_secrets:
         This allows you to keep your API credentials secure and separate from your code.
         """)
 
+# Response cache counters (rendered last so they include this run)
+with st.sidebar:
+    st.markdown("### Response Cache")
+    if response_cache is None:
+        st.markdown('<div class="subtle-text">Bypassed while recording fixtures</div>', unsafe_allow_html=True)
+    else:
+        cache_stats = response_cache.stats()
+        st.markdown('<div class="stats-box">', unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Hits: {cache_stats["memory_hits"] + cache_stats["disk_hits"]} '
+                    f'(memory {cache_stats["memory_hits"]}, disk {cache_stats["disk_hits"]})</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Misses: {cache_stats["misses"]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Hit rate: {cache_stats["hit_rate"]:.0%}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Stored responses: {cache_stats["disk_entries"]} '
+                    f'({cache_stats["disk_bytes"] / 1024:.1f} KB on disk)</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        if st.button("Clear cache", help="Remove all cached Watson responses"):
+            response_cache.clear()
+            st.rerun()
+
+    # Retries, throttling and latency of the Watson requests sent with these credentials
+    if credentials_ready:
+        scheduler_stats = get_request_scheduler(api_key, url).stats()
+        st.markdown("### Watson Requests")
+        st.markdown('<div class="stats-box">', unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Requests: {scheduler_stats["requests"]} '
+                    f'({scheduler_stats["retries"]} retries, {scheduler_stats["failed"]} failed)</div>',
+                    unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Throttled: {scheduler_stats["throttled"]} '
+                    f'({scheduler_stats["throttle_wait_seconds"]:.1f} s waiting)</div>', unsafe_allow_html=True)
+        if scheduler_stats["p50"] is not None:
+            st.markdown(f'<div class="stats-item">Latency p50 / p95 / p99: {scheduler_stats["p50"] * 1000:.0f} / '
+                        f'{scheduler_stats["p95"] * 1000:.0f} / {scheduler_stats["p99"] * 1000:.0f} ms</div>',
+                        unsafe_allow_html=True)
+        st.markdown(f'<div class="stats-item">Circuit breaker: {scheduler_stats["breaker"]}</div>',
+                    unsafe_allow_html=True)
+        if offline_backend:
+            backend_stats = get_nlu_client(api_key, url).stats()
+            st.markdown(f'<div class="stats-item">Backend {backend["mode"]}: {backend_stats["replayed"]} replayed, '
+                        f'{backend_stats["synthetic"]} synthetic, {backend_stats["errors"]} failed</div>',
+                        unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
 # Footer
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<div class="subtle-text">IBM Watson Natural Language Understanding API Explorer - v1.0.0</div>', unsafe_allow_html=True)
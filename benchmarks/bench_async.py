@@ -0,0 +1,123 @@
+"""Throughput and memory of the threaded vs. asyncio analyze paths.
+
+Starts the fake Watson server in a subprocess (with per-request latency, as
+a stand-in for the real round trip), then analyzes the same documents with
+``batch.run_batch`` over the pooled SDK client and with
+``AsyncNLUClient.analyze_many``, at several concurrency levels. Each run is
+its own subprocess so peak RSS and thread counts do not leak between them:
+
+    python benchmarks/bench_async.py --documents 2000 --concurrency 10 100 1000
+
+Needs aiohttp for the asyncio runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nlu_analyzer.pipeline import feature_spec  # noqa: E402
+
+TEXT = "IBM Watson extracts keywords and entities from documents written in Paris and Rome. " * 20
+FEATURES = feature_spec(["keywords", "entities"])
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def documents(count):
+    for i in range(count):
+        yield f"doc-{i}", f"{TEXT} Document {i}."
+
+
+def run_threaded(url, count, concurrency):
+    from nlu_analyzer import service
+    from nlu_analyzer.batch import run_batch
+    from nlu_analyzer.client import create_client
+
+    client = create_client("benchmark", url, pool_maxsize=concurrency, iam_url=url)
+    peak_threads = 0
+    failed = 0
+    for result in run_batch(lambda text: service.analyze(client, text, FEATURES, None), documents(count),
+                            max_workers=concurrency):
+        failed += result.error is not None
+        peak_threads = max(peak_threads, threading.active_count())
+    return failed, peak_threads
+
+
+def run_async(url, count, concurrency):
+    from nlu_analyzer.async_client import AsyncNLUClient
+
+    async def main():
+        failed = 0
+        async with AsyncNLUClient("benchmark", url, iam_url=url, max_concurrency=concurrency) as client:
+            async for result in client.analyze_many(documents(count), FEATURES):
+                failed += result.error is not None
+        return failed
+
+    return asyncio.run(main()), threading.active_count()
+
+
+def run_mode(mode, url, count, concurrency):
+    start = time.perf_counter()
+    failed, peak_threads = (run_threaded if mode == "threaded" else run_async)(url, count, concurrency)
+    seconds = time.perf_counter() - start
+    return {"mode": mode, "concurrency": concurrency, "documents": count, "failed": failed,
+            "seconds": round(seconds, 3), "requests_per_second": round(count / seconds, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1), "peak_threads": peak_threads}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server latency per request (seconds)")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--mode", choices=["threaded", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.url, args.documents, args.concurrency[0])))
+        return
+
+    server = subprocess.Popen([sys.executable, "-m", "nlu_analyzer.fake_server", "--port", str(args.port),
+                               "--latency", str(args.latency)], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "listening on ..."
+        url = f"http://127.0.0.1:{args.port}"
+        results = []
+        for concurrency in args.concurrency:
+            for mode in ("threaded", "async"):
+                output = subprocess.run([sys.executable, __file__, "--mode", mode, "--url", url,
+                                         "--documents", str(args.documents), "--concurrency", str(concurrency)],
+                                        check=True, capture_output=True, text=True).stdout
+                results.append(json.loads(output))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{'mode':<9} {'concurrency':>11} {'req/s':>8} {'seconds':>8} {'peak RSS (MB)':>14} {'threads':>8}  "
+          f"({args.documents} documents, {args.latency * 1000:.0f} ms latency)")
+    for result in results:
+        print(f"{result['mode']:<9} {result['concurrency']:>11} {result['requests_per_second']:>8} "
+              f"{result['seconds']:>8} {result['peak_rss_mb']:>14} {result['peak_threads']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "async", "documents": args.documents, "latency": args.latency,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
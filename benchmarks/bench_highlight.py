@@ -0,0 +1,78 @@
+"""Target-keyword highlighting: per-row Python loop vs. one vectorized matcher.
+
+    python benchmarks/bench_highlight.py --rows 100000 --keywords 1000
+
+The "loop" baseline is the row function the result tables used to pass to
+``Styler.apply(axis=1)``; the other columns time ``KeywordMatcher.mask`` in
+each match mode (including building the matcher).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from nlu_analyzer.highlight import KeywordMatcher  # noqa: E402
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def make_frame(rows, vocabulary, rng):
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))) for _ in range(rows)]
+    return pd.DataFrame({"text": texts, "relevance": [rng.random() for _ in range(rows)]})
+
+
+def loop_mask(df, target_keywords_list):
+    def highlight_target_keywords(row):
+        text = row['text'].lower()
+        for kw in target_keywords_list:
+            if kw == text or kw in text.split():
+                return True
+        return False
+    return df.apply(highlight_target_keywords, axis=1).to_numpy()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--keywords", type=int, default=1000)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(20000, rng)
+    df = make_frame(args.rows, vocabulary, rng)
+    keywords = rng.sample(vocabulary, args.keywords)
+
+    results = []
+    seconds, expected = timed(lambda: loop_mask(df, keywords))
+    results.append({"method": "loop", "seconds": round(seconds, 3), "matches": int(expected.sum())})
+    for mode in ("word", "substring", "stem"):
+        seconds, mask = timed(lambda: KeywordMatcher(keywords, mode).mask(df, ["text"]))
+        results.append({"method": f"matcher/{mode}", "seconds": round(seconds, 3), "matches": int(mask.sum())})
+
+    print(f"{'method':<18} {'seconds':>8} {'matches':>8}  ({args.rows} rows x {args.keywords} keywords)")
+    for result in results:
+        print(f"{result['method']:<18} {result['seconds']:>8} {result['matches']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "highlight", "rows": args.rows, "keywords": args.keywords,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Peak memory of reading a large upload: full decode vs. streaming reader.
+
+Each mode runs in its own subprocess so the peak RSS figures do not leak
+into each other:
+
+    python benchmarks/bench_reader.py --size-mb 100
+
+The "getvalue" mode mirrors the old app path (whole file to bytes, to str,
+plus a copy for the preview widget, then split into chunks); the "stream"
+mode decodes incrementally, shows a head/tail excerpt and cuts chunks as the
+file is read. Chunks are handed to a no-op analyze function so only the
+reading side is measured.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_analyzer.chunking import analyze_chunks, split_stream, split_text  # noqa: E402
+from nlu_analyzer.reader import iter_text, open_text, preview  # noqa: E402
+
+PARAGRAPH = ("IBM Watson Natural Language Understanding extracts keywords, entities and categories. "
+             "Città, Zürich and Kraków appear in the text too!\n\n")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def write_sample(path, size_mb):
+    paragraph = PARAGRAPH.encode("utf-8")
+    with open(path, "wb") as f:
+        for _ in range(size_mb * 1024 * 1024 // len(paragraph) + 1):
+            f.write(paragraph)
+
+
+def noop_analyze(chunk):
+    return {"keywords": [], "usage": {"text_characters": len(chunk)}}
+
+
+def run_mode(mode, path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if mode == "getvalue":
+            text = f.read().decode("utf-8")
+            preview_payload = text.encode("utf-8")  # what the full text_area sends to the browser
+            chunks = split_text(text)
+            analyze_chunks(noop_analyze, chunks, {"keywords": {}})
+            del preview_payload
+        else:
+            encoding, _ = open_text(f)
+            preview(f, encoding)
+            analyze_chunks(noop_analyze, split_stream(iter_text(f, encoding)), {"keywords": {}})
+    return {"mode": mode, "seconds": round(time.perf_counter() - start, 3), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--mode", choices=["getvalue", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.path)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sample.txt")
+        write_sample(path, args.size_mb)
+        results = []
+        for mode in ("getvalue", "stream"):
+            output = subprocess.run([sys.executable, __file__, "--mode", mode, "--path", path],
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output))
+
+    print(f"{'mode':<10} {'seconds':>8} {'peak RSS (MB)':>14}  ({args.size_mb} MB input)")
+    for result in results:
+        print(f"{result['mode']:<10} {result['seconds']:>8} {result['peak_rss_mb']:>14}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "reader", "size_mb": args.size_mb, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
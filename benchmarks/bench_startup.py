@@ -0,0 +1,164 @@
+"""Cold start and rerun cost of the Streamlit app.
+
+    python benchmarks/bench_startup.py --json bench/startup-$(git rev-parse --short HEAD).json
+    git worktree add /tmp/before HEAD~1
+    python benchmarks/bench_startup.py --app /tmp/before/app.py --compare bench/startup-<commit>.json
+
+Every measurement runs ``app.py`` through Streamlit's testing harness in a
+fresh interpreter (synthetic backend, temporary working directory), so the
+numbers are the server-side share of what a user waits for:
+
+- ``process``: interpreter start up to the end of the first script run
+- ``import``: importing Streamlit (and its testing harness)
+- ``first_paint``: the first script run of the app (its own imports, shared
+  resources, sidebar and input form), i.e. time to first paint once
+  Streamlit is up; the heavy modules loaded by then are listed
+- ``rerun_idle``, ``rerun_widget``: reruns without results, unchanged or
+  after toggling a sidebar checkbox
+- ``analyze``: the first analysis of a short text
+- ``rerun_results``, ``rerun_tab``: reruns with the results shown, unchanged
+  or after switching the results tab
+
+Cold starts report the median of ``--cold`` processes, reruns the median of
+``--repeat`` reruns.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose import dominates a cold start
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "ibm_watson", "ibm_cloud_sdk_core", "requests"]
+TEXT = "Apple opened a store in Paris. Apple sells phones in Paris and Rome. " * 5
+
+
+def child(mode, app, repeat):
+    """Run in a fresh interpreter: print the measurements of ``mode`` ("cold" or "rerun") as JSON."""
+    started = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+
+    at = AppTest.from_file(app, default_timeout=300)
+    at.run()
+    painted = time.perf_counter()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if mode == "cold":
+        print(json.dumps({"import": imported - started, "first_paint": painted - imported,
+                          "modules": [name for name in HEAVY_MODULES if name in sys.modules]}))
+        return
+
+    def timed(action):
+        start = time.perf_counter()
+        action()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return time.perf_counter() - start
+
+    def median_of(action):
+        return statistics.median(timed(action) for _ in range(repeat))
+
+    relations = [checkbox for checkbox in at.checkbox if checkbox.label == "Relations"][0]
+    results = {"rerun_idle": median_of(at.run),
+               "rerun_widget": median_of(lambda: relations.set_value(not relations.value).run())}
+    at.text_area[0].input(TEXT).run()
+
+    def analyze():
+        [b for b in at.button if b.label == "Analyze"][0].click().run()
+        # Newer versions run the analysis on a job queue and pick it up on a later rerun
+        while "analysis" not in at.session_state:
+            time.sleep(0.05)
+            at.run()
+
+    results["analyze"] = timed(analyze)
+    results["rerun_results"] = median_of(at.run)
+    tabs = iter(["Classification", "Extraction"] * repeat)
+
+    def switch_tab():
+        at.session_state["main_tabs"] = next(tabs)
+        at.run()
+
+    results["rerun_tab"] = median_of(switch_tab)
+    print(json.dumps(results))
+
+
+def run_child(mode, app, repeat):
+    env = dict(os.environ, NLU_BACKEND="synthetic", PYTHONPATH=os.path.dirname(os.path.abspath(app)))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--app", app,
+                                    "--repeat", str(repeat)], cwd=directory, env=env, check=True,
+                                   capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if mode == "cold":
+        result["process"] = seconds
+    return result
+
+
+def git_commit(app):
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(app)), check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {r["case"]: r for r in json.load(f)["results"]}
+    print(f"\n{'case':<14} {'seconds':>9} {'baseline':>9} {'change':>8}")
+    for result in results:
+        old = baseline.get(result["case"])
+        if old is None:
+            continue
+        change = (result["seconds"] / old["seconds"] - 1) * 100 if old["seconds"] else 0.0
+        print(f"{result['case']:<14} {result['seconds']:>9.3f} {old['seconds']:>9.3f} {change:>+7.0f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"), help="The app.py to measure")
+    parser.add_argument("--cold", type=int, default=5, help="Number of cold starts")
+    parser.add_argument("--repeat", type=int, default=5, help="Reruns per rerun case")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="Compare with the results of an earlier run")
+    parser.add_argument("--child", choices=["cold", "rerun"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.child, args.app, args.repeat)
+        return
+
+    cold = [run_child("cold", args.app, args.repeat) for _ in range(args.cold)]
+    measured = {case: statistics.median(run[case] for run in cold) for case in ("process", "import", "first_paint")}
+    measured.update(run_child("rerun", args.app, args.repeat))
+    results = [{"case": case, "seconds": round(seconds, 4)} for case, seconds in measured.items()]
+    modules = cold[-1]["modules"]
+
+    print(f"{'case':<14} {'seconds':>9}")
+    for result in results:
+        print(f"{result['case']:<14} {result['seconds']:>9.3f}")
+    print(f"Loaded at first paint: {', '.join(modules) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "startup", "commit": git_commit(args.app), "python": platform.python_version(),
+                       "platform": platform.platform(), "started": time.time(), "cold": args.cold,
+                       "repeat": args.repeat, "modules": modules, "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Analysis and rendering hot paths on synthetic Watson responses of growing size.
+
+    python benchmarks/bench_suite.py --json results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_suite.py --compare results/main.json
+
+Every response has ``size`` keywords, entities and relations (plus a few
+concepts and categories). Each case is timed ``--repeat`` times (best run
+reported) and then run once more under ``tracemalloc`` for its peak Python
+memory:
+
+- ``dataframe``: the single-document tables (``batch.display_frame``)
+- ``relations``: ``pipeline.flatten_relations``
+- ``highlight``: ``highlight.highlight`` with 100 target keywords
+- ``textstats``: ``textstats.text_statistics`` on a text of ``size`` sentences
+- ``json``: ``json.dumps`` (as the JSON download) and ``json.loads``
+- ``corpus``: ``corpus.CorpusAggregator`` folding the response in as
+  documents of 100 entities and keywords each, then its ranking queries
+- ``rerun``: a scripted Streamlit rerun of ``app.py`` (testing harness,
+  synthetic backend) rendering the response, with its tables not yet built
+  and already built
+
+The JSON output carries the git commit, so runs can be compared across
+commits with ``--compare``.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import lru_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nlu_analyzer.batch import display_frame  # noqa: E402
+from nlu_analyzer.corpus import CorpusAggregator  # noqa: E402
+from nlu_analyzer.highlight import KeywordMatcher, highlight  # noqa: E402
+from nlu_analyzer.pipeline import flatten_relations  # noqa: E402
+from nlu_analyzer.textstats import text_statistics  # noqa: E402
+
+CASES = ["dataframe", "relations", "highlight", "textstats", "json", "corpus", "rerun"]
+ENTITY_TYPES = ["Person", "Organization", "Location", "Company", "Facility", "GeographicFeature", "JobTitle"]
+RELATION_TYPES = ["employedBy", "locatedAt", "partOf", "basedIn", "ownerOf", "residesIn"]
+SENTENCE = "Dr. Watson met the analysts of the U.S. team in Armonk and they discussed 3.5 ideas. "
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def _sentiment(rng):
+    score = round(rng.uniform(-1, 1), 6)
+    return {"score": score, "label": "positive" if score > 0.1 else "negative" if score < -0.1 else "neutral"}
+
+
+@lru_cache(maxsize=1)
+def make_response(size, seed=42):
+    """A response shaped like Watson's with ``size`` keywords, entities and relations (shared, do not modify)."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(max(size, 100), rng)
+
+    def phrase():
+        return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+
+    entities = []
+    for _ in range(size):
+        entity = {"type": rng.choice(ENTITY_TYPES), "text": phrase().title(),
+                  "relevance": round(rng.random(), 6), "count": rng.randint(1, 20),
+                  "confidence": round(rng.random(), 6), "sentiment": _sentiment(rng)}
+        entities.append(entity)
+    relations = []
+    for _ in range(size):
+        arguments = [{"text": entity["text"], "location": [0, len(entity["text"])],
+                      "entities": [{"type": entity["type"], "text": entity["text"]}]}
+                     for entity in rng.sample(entities, 2)] if len(entities) >= 2 else []
+        relations.append({"type": rng.choice(RELATION_TYPES), "sentence": f"{phrase().capitalize()} {phrase()}.",
+                          "score": round(rng.random(), 6), "arguments": arguments})
+    return {
+        "usage": {"text_units": max(1, size // 100), "text_characters": size * 100, "features": 5},
+        "language": "en",
+        "keywords": [{"text": phrase(), "relevance": round(rng.random(), 6), "count": rng.randint(1, 50),
+                      "sentiment": _sentiment(rng)} for _ in range(size)],
+        "entities": entities,
+        "concepts": [{"text": phrase().title(), "relevance": round(rng.random(), 6),
+                      "dbpedia_resource": f"http://dbpedia.org/resource/{rng.choice(vocabulary).title()}"}
+                     for _ in range(min(size, 50))],
+        "categories": [{"score": round(rng.random(), 6), "label": f"/{rng.choice(vocabulary)}/{rng.choice(vocabulary)}"}
+                       for _ in range(min(size, 5))],
+        "relations": relations,
+    }
+
+
+def case_functions(size):
+    """``{case: (setup, run)}``; ``setup`` runs untimed and returns the argument of ``run``."""
+    def dataframes(response):
+        return [display_frame(feature, response[feature])
+                for feature in ("keywords", "entities", "concepts", "categories")]
+
+    def highlighted(args):
+        df, keywords = args
+        return highlight(df, KeywordMatcher(keywords), ["text"])
+
+    def highlight_setup():
+        response = make_response(size)
+        df = display_frame("keywords", response["keywords"])
+        keywords = tuple(dict.fromkeys(word for item in response["keywords"][:100] for word in item["text"].split()))
+        return df, keywords
+
+    def json_roundtrip(response):
+        return json.loads(json.dumps(response, indent=2, ensure_ascii=False))
+
+    def corpus_documents():
+        response = make_response(size)
+        return [{"entities": response["entities"][start:start + 100], "keywords": response["keywords"][start:start + 100],
+                 "categories": response["categories"]} for start in range(0, size, 100)]
+
+    def aggregated(documents):
+        corpus = CorpusAggregator()
+        for document in documents:
+            corpus.add(document)
+        return corpus.top_terms("entities", 50), corpus.cooccurrence(50), corpus.category_trends()
+
+    return {
+        "dataframe": (lambda: make_response(size), dataframes),
+        "relations": (lambda: make_response(size)["relations"], flatten_relations),
+        "highlight": (highlight_setup, highlighted),
+        "textstats": (lambda: SENTENCE * size, lambda text: text_statistics(text, "en")),
+        "json": (lambda: make_response(size), json_roundtrip),
+        "corpus": (corpus_documents, aggregated),
+    }
+
+
+def measure(setup, run, repeat):
+    argument = setup()
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(argument)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    gc.collect()
+    tracemalloc.start()
+    run(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_mb": round(peak / (1024 * 1024), 3)}
+
+
+def rerun_results(size, repeat):
+    """Time Streamlit reruns of the app with a ``size`` response in session state."""
+    from streamlit.testing.v1 import AppTest
+
+    text = "Apple opened a store in Paris. Apple sells phones in Paris and Rome."
+    os.environ["NLU_BACKEND"] = "synthetic"
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # The app's caches and stores land in the temporary directory
+        os.chdir(directory)
+        try:
+            at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+            at.run()
+            at.text_area[0].input(text).run()
+            [ti for ti in at.text_input if "Target" in ti.label][0].input("analysts, armonk").run()
+            [b for b in at.button if b.label == "Analyze"][0].click().run()
+            # The analysis runs on the app's job queue; rerun until the session has picked it up
+            while "analysis" not in at.session_state:
+                time.sleep(0.05)
+                at.run()
+            analysis = at.session_state["analysis"]
+            assert analysis["input"] == hashlib.sha256(text.encode("utf-8")).hexdigest()
+            response = make_response(size)
+
+            def rerun(frames_built):
+                if not frames_built:
+                    at.session_state["analysis"] = dict(analysis, response=response, frames={})
+                at.run()
+                if at.exception:
+                    raise RuntimeError(at.exception[0].message)
+
+            results = {}
+            for case, frames_built in (("rerun_cold", False), ("rerun_warm", True)):
+                results[case] = measure(lambda: frames_built, rerun, repeat)
+        finally:
+            os.chdir(previous)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\n{'case':<12} {'size':>7} {'seconds':>10} {'baseline':>10} {'change':>8} {'peak MB':>9} {'baseline':>9}")
+    for result in results:
+        old = baseline.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        change = (result["seconds"] / old["seconds"] - 1) * 100 if old["seconds"] else 0.0
+        print(f"{result['case']:<12} {result['size']:>7} {result['seconds']:>10.4f} {old['seconds']:>10.4f} "
+              f"{change:>+7.0f}% {result['peak_mb']:>9.2f} {old['peak_mb']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="Compare with the results of an earlier run")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'case':<12} {'size':>7} {'seconds':>10} {'peak MB':>9}")
+    for size in args.sizes:
+        cases = case_functions(size)
+        measured = {case: measure(*cases[case], args.repeat) for case in args.cases if case in cases}
+        if "rerun" in args.cases:
+            measured.update(rerun_results(size, args.repeat))
+        for case, result in measured.items():
+            results.append(dict(result, case=case, size=size))
+            print(f"{case:<12} {size:>7} {result['seconds']:>10.4f} {result['peak_mb']:>9.2f}")
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "suite", "commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "started": time.time(), "repeat": args.repeat,
+                       "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
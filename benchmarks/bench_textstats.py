@@ -0,0 +1,84 @@
+"""Text statistics on multi-megabyte documents: old counting vs. the streaming engine.
+
+    python benchmarks/bench_textstats.py --size-mb 5 10 50
+
+The "naive" mode is the old TEXT STATISTICS code (``str.split`` plus three
+``str.count`` passes, no readability); "engine" is ``textstats.text_statistics``
+over the whole text and "stream" feeds the same engine 64 KiB pieces, as
+``pipeline.analyze_stream`` does for uploads. Each size is timed for an
+English and a Japanese sample.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_analyzer.textstats import TextStatistics, text_statistics  # noqa: E402
+
+SAMPLES = {
+    "en": ("Dr. Watson measured 3.14 units at 9 a.m. and wrote it down. Was it enough? "
+           "The U.S. team, i.e. the analysts, agreed!\n\n"),
+    "ja": "東京は日本の首都です。人口はとても多いです！ワトソンは文章を解析しますか？\n\n",
+}
+PIECE_CHARS = 64 * 1024
+
+
+def naive_statistics(text):
+    return {
+        "words": len(text.split()),
+        "sentences": text.count('.') + text.count('!') + text.count('?'),
+        "characters": len(text),
+    }
+
+
+def stream_statistics(text, language):
+    statistics = TextStatistics(language)
+    for start in range(0, len(text), PIECE_CHARS):
+        statistics.update(text[start:start + PIECE_CHARS])
+    return statistics.statistics
+
+
+def run(text, language, mode, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == "naive":
+            statistics = naive_statistics(text)
+        elif mode == "engine":
+            statistics = text_statistics(text, language)
+        else:
+            statistics = stream_statistics(text, language)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, statistics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'language':<9} {'MB':>4} {'mode':<7} {'seconds':>8} {'MB/s':>7} {'words':>10} {'sentences':>10}")
+    for size_mb in args.size_mb:
+        for language, sample in SAMPLES.items():
+            text = sample * (size_mb * 1024 * 1024 // len(sample.encode("utf-8")) + 1)
+            for mode in ("naive", "engine", "stream"):
+                seconds, statistics = run(text, language, mode, args.repeat)
+                result = {"language": language, "size_mb": size_mb, "mode": mode, "seconds": round(seconds, 3),
+                          "mb_per_second": round(size_mb / seconds, 1), "statistics": statistics}
+                results.append(result)
+                print(f"{language:<9} {size_mb:>4} {mode:<7} {result['seconds']:>8} {result['mb_per_second']:>7} "
+                      f"{statistics['words']:>10} {statistics['sentences']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "textstats", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
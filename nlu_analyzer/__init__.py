@@ -0,0 +1 @@
+"""Supporting modules for the IBM Watson NLU Analyzer Streamlit app."""
@@ -0,0 +1,142 @@
+"""Asyncio client for the Watson NLU ``/v1/analyze`` endpoint.
+
+The SDK call is blocking, so the threaded paths need one OS thread per
+request in flight. ``AsyncNLUClient`` keeps thousands of requests in flight
+from a single thread over one pooled keep-alive ``aiohttp`` session, with
+one IAM token shared (and refreshed once) by every request::
+
+    async with AsyncNLUClient(api_key, url, max_concurrency=200) as client:
+        async for result in client.analyze_many(documents, features):
+            ...
+
+Features are given as a feature spec (see ``service.build_features``) or an
+SDK ``Features`` object, with the same semantics as the blocking client.
+Requires ``aiohttp`` (``pip install aiohttp``).
+"""
+import asyncio
+import json
+import time
+
+from ibm_cloud_sdk_core import ApiException
+
+from nlu_analyzer.batch import BatchResult
+from nlu_analyzer.service import API_VERSION
+
+DEFAULT_IAM_URL = "https://iam.cloud.ibm.com"
+
+# Refresh the IAM token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 60
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("The asyncio client needs aiohttp: pip install aiohttp") from None
+    return aiohttp
+
+
+class AsyncNLUClient:
+    """Pooled, concurrency-limited async client; use it as an ``async with`` context manager."""
+
+    def __init__(self, api_key, url, iam_url=None, max_concurrency=100, pool_size=None, timeout=60.0,
+                 version=API_VERSION):
+        self.api_key = api_key
+        self.url = url.rstrip("/")
+        self.iam_url = (iam_url or DEFAULT_IAM_URL).rstrip("/")
+        self.version = version
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size or max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._token = None
+        self._token_expires = 0.0
+        self._session = None
+
+    async def __aenter__(self):
+        aiohttp = _import_aiohttp()
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def token(self):
+        """Return a valid IAM access token, fetching it once for all concurrent callers."""
+        if self._token and time.time() < self._token_expires - TOKEN_REFRESH_MARGIN:
+            return self._token
+        async with self._token_lock:
+            # Another request may have refreshed it while this one waited for the lock
+            if self._token and time.time() < self._token_expires - TOKEN_REFRESH_MARGIN:
+                return self._token
+            async with self._session.post(
+                f"{self.iam_url}/identity/token",
+                data={"grant_type": "urn:ibm:params:oauth:grant-type:apikey", "apikey": self.api_key,
+                      "response_type": "cloud_iam"},
+                headers={"Accept": "application/json"},
+            ) as response:
+                body = await response.read()
+                if response.status != 200:
+                    raise ApiException(response.status, message=f"IAM token request failed: {body[:200]!r}")
+            result = json.loads(body)
+            self._token = result["access_token"]
+            self._token_expires = result.get("expiration") or time.time() + result.get("expires_in", 3600)
+            return self._token
+
+    async def analyze(self, text, features, language=None):
+        """Analyze one text and return the response dict (like ``service.analyze`` without chunking)."""
+        if hasattr(features, "_to_dict"):
+            features = features._to_dict()
+        payload = {"text": text, "features": features}
+        if language:
+            payload["language"] = language
+        async with self._semaphore:
+            token = await self.token()
+            async with self._session.post(
+                f"{self.url}/v1/analyze", params={"version": self.version}, json=payload,
+                headers={"Authorization": f"Bearer {token}", "Accept": "application/json"},
+            ) as response:
+                body = await response.read()
+                if response.status != 200:
+                    try:
+                        message = json.loads(body).get("error")
+                    except ValueError:
+                        message = body[:200].decode("utf-8", "replace")
+                    raise ApiException(response.status, message=message)
+        return json.loads(body)
+
+    async def analyze_many(self, documents, features, language=None):
+        """Analyze ``(doc_id, text)`` pairs concurrently, yielding ``BatchResult`` as they complete.
+
+        At most ``2 * max_concurrency`` documents are taken from ``documents``
+        at a time, so very large (or lazily read) inputs keep memory flat.
+        """
+        documents = iter(documents)
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * self.max_concurrency:
+                try:
+                    doc_id, text = next(documents)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[asyncio.ensure_future(self.analyze(text, features, language))] = doc_id
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                doc_id = pending.pop(task)
+                error = task.exception()
+                if error is not None:
+                    yield BatchResult(doc_id, None, str(error))
+                else:
+                    yield BatchResult(doc_id, task.result(), None)
@@ -0,0 +1,241 @@
+"""Pluggable backends behind the ``analyze`` call: live, record, replay and synthetic.
+
+Every backend answers ``client.analyze(text=..., features=..., language=...,
+stream=True).get_result()`` like the SDK client, so ``service``, the batch
+paths and the app do not know which one they talk to:
+
+- "live" is the SDK client calling Watson;
+- "record" is the live client, with every request/response pair also
+  written to a fixtures directory;
+- "replay" answers from those fixtures without network or credentials
+  (a request that was never recorded fails, unless ``misses="synthetic"``);
+- "synthetic" generates responses (see ``fake_server.fake_analysis``).
+
+Replay and synthetic add ``latency`` seconds per request and fail a fraction
+``error_rate`` of requests with ``error_status``, so retry and load behaviour
+can be benchmarked reproducibly offline. ``backend_settings`` reads the mode
+and options from ``NLU_BACKEND``, ``NLU_FIXTURES``, ``NLU_BACKEND_LATENCY``,
+``NLU_BACKEND_ERROR_RATE``, ``NLU_BACKEND_ERROR_STATUS``,
+``NLU_BACKEND_RETRY_AFTER``, ``NLU_BACKEND_SEED`` and ``NLU_REPLAY_MISSES``.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from nlu_analyzer.fake_server import fake_analysis
+from nlu_analyzer.service import API_VERSION
+
+BACKEND_MODES = ("live", "record", "replay", "synthetic")
+
+# Modes that never reach Watson and need no credentials
+OFFLINE_MODES = ("replay", "synthetic")
+
+DEFAULT_FIXTURES_PATH = os.path.join(".nlu_cache", "fixtures")
+
+
+def fixture_key(text, features, language, version=API_VERSION):
+    """Identify a request by its text, feature dict, language and API version."""
+    payload = json.dumps({"text": text, "features": features, "language": language, "version": version},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _features_dict(features):
+    return features._to_dict() if hasattr(features, "_to_dict") else features
+
+
+def _http_response(status, body, headers=None):
+    # The HTTP and SDK imports are deferred to the first request (not needed for app startup)
+    import requests
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    response.headers.update(headers or {})
+    return response
+
+
+class FixtureStore:
+    """Recorded responses in ``directory``, one JSON file per request (``<key[:2]>/<key>.json``)."""
+
+    def __init__(self, directory=DEFAULT_FIXTURES_PATH):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def load(self, key):
+        """Return the recorded response for ``key``, or ``None``."""
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                return json.load(f)["response"]
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, request, response):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so concurrent requests never see half a fixture
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"request": request, "response": response}, f, ensure_ascii=False, indent=1)
+        os.replace(temporary, path)
+
+    def __len__(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(name.endswith(".json") for _, _, names in os.walk(self.directory) for name in names)
+
+
+class RecordingClient:
+    """Live client that also saves every successful response as a fixture.
+
+    Anything but ``analyze`` is delegated to the wrapped client, so token and
+    connection timings keep working.
+    """
+
+    def __init__(self, client, fixtures=DEFAULT_FIXTURES_PATH, version=API_VERSION):
+        self.client = client
+        self.fixtures = FixtureStore(fixtures)
+        self.version = version
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def analyze(self, *, text, features, language=None, stream=False, **kwargs):
+        from ibm_cloud_sdk_core import DetailedResponse
+        detailed = self.client.analyze(text=text, features=features, language=language, stream=True, **kwargs)
+        response = detailed.get_result()
+        body = json.loads(response.content)
+        features = _features_dict(features)
+        self.fixtures.save(fixture_key(text, features, language, self.version),
+                           {"text": text, "features": features, "language": language, "version": self.version}, body)
+        with self._lock:
+            self.recorded += 1
+        return DetailedResponse(response=response if stream else body, headers=dict(response.headers),
+                                status_code=response.status_code)
+
+
+class OfflineClient:
+    """Serves recorded (``mode="replay"``) or generated (``mode="synthetic"``) responses; thread-safe.
+
+    Has no ``authenticator`` or ``connection_stats``, so token and connect
+    timings are reported as zero.
+    """
+
+    authenticator = None
+
+    def __init__(self, mode="synthetic", fixtures=DEFAULT_FIXTURES_PATH, latency=0.0, error_rate=0.0,
+                 error_status=429, retry_after=1, seed=None, misses="error", version=API_VERSION):
+        if mode not in OFFLINE_MODES:
+            raise ValueError(f"Unknown offline backend '{mode}', expected one of: {', '.join(OFFLINE_MODES)}")
+        self.mode = mode
+        self.fixtures = FixtureStore(fixtures)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.misses = misses
+        self.version = version
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "replayed": 0, "synthetic": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _injected_error(self):
+        with self._lock:
+            failed = bool(self.error_rate) and self._random.random() < self.error_rate
+        if not failed:
+            return None
+        from ibm_cloud_sdk_core import ApiException
+        headers = {"Retry-After": str(self.retry_after)} if self.error_status in (429, 503) else None
+        body = {"code": self.error_status, "error": "Injected error"}
+        return ApiException(self.error_status, message=body["error"],
+                            http_response=_http_response(self.error_status, body, headers))
+
+    def analyze(self, *, text, features, language=None, stream=False, **kwargs):
+        from ibm_cloud_sdk_core import ApiException, DetailedResponse
+        self._count("requests")
+        if self.latency:
+            time.sleep(self.latency)
+        error = self._injected_error()
+        if error is not None:
+            self._count("errors")
+            raise error
+
+        features = _features_dict(features)
+        body = None
+        if self.mode == "replay":
+            body = self.fixtures.load(fixture_key(text, features, language, self.version))
+            if body is None and self.misses != "synthetic":
+                self._count("errors")
+                message = f"No recorded response for this request in {self.fixtures.directory}"
+                raise ApiException(404, message=message,
+                                   http_response=_http_response(404, {"code": 404, "error": message}))
+            if body is not None:
+                self._count("replayed")
+        if body is None:
+            body = fake_analysis(text, features, language)
+            self._count("synthetic")
+        response = _http_response(200, body)
+        return DetailedResponse(response=response if stream else body, headers=dict(response.headers),
+                                status_code=200)
+
+    def stats(self):
+        """Requests served, replayed from fixtures, generated and failed."""
+        with self._lock:
+            return dict(self._counters)
+
+
+def backend_settings(env=os.environ):
+    """Backend mode and options from the environment (``live`` when ``NLU_BACKEND`` is unset)."""
+    mode = (env.get("NLU_BACKEND") or "live").strip().lower()
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Unknown NLU_BACKEND '{mode}', expected one of: {', '.join(BACKEND_MODES)}")
+    seed = env.get("NLU_BACKEND_SEED")
+    return {
+        "mode": mode,
+        "fixtures": env.get("NLU_FIXTURES") or DEFAULT_FIXTURES_PATH,
+        "latency": float(env.get("NLU_BACKEND_LATENCY") or 0.0),
+        "error_rate": float(env.get("NLU_BACKEND_ERROR_RATE") or 0.0),
+        "error_status": int(env.get("NLU_BACKEND_ERROR_STATUS") or 429),
+        "retry_after": int(env.get("NLU_BACKEND_RETRY_AFTER") or 1),
+        "seed": int(seed) if seed else None,
+        "misses": env.get("NLU_REPLAY_MISSES") or "error",
+    }
+
+
+def create_backend(api_key=None, url=None, mode="live", fixtures=DEFAULT_FIXTURES_PATH, latency=0.0, error_rate=0.0,
+                   error_status=429, retry_after=1, seed=None, misses="error", **client_options):
+    """Build the client for ``mode``; live and record need ``api_key`` and ``url``."""
+    if mode in OFFLINE_MODES:
+        return OfflineClient(mode, fixtures, latency, error_rate, error_status, retry_after, seed, misses)
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Unknown backend '{mode}', expected one of: {', '.join(BACKEND_MODES)}")
+
+    from nlu_analyzer.client import create_client
+    client = create_client(api_key, url, **client_options)
+    return RecordingClient(client, fixtures) if mode == "record" else client
+
+
+def cache_path(path, mode):
+    """Response cache file for ``mode``, or ``None`` when recording: every request must reach Watson to be recorded."""
+    if mode == "record":
+        return None
+    return isolated_path(path, mode)
+
+
+def isolated_path(path, mode):
+    """Give offline backends their own cache/store files, so generated responses never mix with Watson's."""
+    if mode not in OFFLINE_MODES:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{mode}{extension}"
@@ -0,0 +1,129 @@
+"""Batch analysis: load many documents and fan them out over a worker pool."""
+import csv
+import io
+import json
+import os
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from nlu_analyzer.pipeline import flatten_relations, flatten_response
+from nlu_analyzer.reader import detect_encoding
+
+# Outcome of analyzing one document; exactly one of response/error is set
+BatchResult = namedtuple("BatchResult", ["doc_id", "response", "error"])
+
+BATCH_FILE_TYPES = ["txt", "zip", "csv", "jsonl"]
+
+
+def load_documents(name, data, text_column="text", id_column="id"):
+    """Yield ``(doc_id, text)`` pairs from an uploaded file.
+
+    ``.txt`` files are one document, ``.zip`` archives are read member by
+    member and ``.csv``/``.jsonl`` files contribute one document per row,
+    taken from ``text_column``. Rows keep their ``id_column`` value as the
+    document id when present. Files are decoded with the encoding
+    ``reader.detect_encoding`` guesses, replacing undecodable bytes.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension == ".zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or os.path.basename(member.filename).startswith("."):
+                    continue
+                if os.path.splitext(member.filename)[1].lower() not in (".txt", ".csv", ".jsonl"):
+                    continue
+                yield from load_documents(f"{name}/{member.filename}", archive.read(member),
+                                          text_column, id_column)
+    elif extension == ".csv":
+        reader = csv.DictReader(io.StringIO(_decode(data)))
+        if text_column not in (reader.fieldnames or []):
+            raise ValueError(f"{name}: column '{text_column}' not found")
+        for row_number, row in enumerate(reader, start=1):
+            yield _row_id(name, row, id_column, row_number), row[text_column] or ""
+    elif extension == ".jsonl":
+        for row_number, line in enumerate(_decode(data).splitlines(), start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if text_column not in row:
+                raise ValueError(f"{name}: line {row_number} has no '{text_column}' field")
+            yield _row_id(name, row, id_column, row_number), row[text_column] or ""
+    else:
+        yield name, _decode(data)
+
+
+def _decode(data):
+    # The sample is enough to choose between a BOM, UTF-8 and a legacy code page
+    return data.decode(detect_encoding(data[:64 * 1024]), errors="replace")
+
+
+def _row_id(name, row, id_column, row_number):
+    if row.get(id_column) not in (None, ""):
+        return str(row[id_column])
+    return f"{name}:{row_number}"
+
+
+def run_batch(analyze_fn, documents, max_workers=4):
+    """Analyze ``documents`` concurrently and yield ``BatchResult`` as they complete.
+
+    ``analyze_fn(text)`` is called from ``max_workers`` threads, so it should
+    share one authenticated client. At most ``2 * max_workers`` documents are
+    in flight at once, which keeps memory flat for very large jobs. Pass a
+    ``RequestScheduler`` to the analysis to throttle calls to the Watson plan.
+    """
+    documents = iter(documents)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * max_workers:
+                try:
+                    doc_id, text = next(documents)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(analyze_fn, text)] = doc_id
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                doc_id = pending.pop(future)
+                try:
+                    yield BatchResult(doc_id, future.result(), None)
+                except Exception as e:
+                    yield BatchResult(doc_id, None, str(e))
+
+
+def results_to_frames(results):
+    """Aggregate ``BatchResult`` objects into one DataFrame per feature plus ``errors``."""
+    # pandas is imported on first use, so the app starts (and batches load) without it
+    import pandas as pd
+    rows = {"keywords": [], "entities": [], "concepts": [], "categories": [], "relations": [], "errors": []}
+    for result in results:
+        if result.error is not None:
+            rows["errors"].append({"doc_id": result.doc_id, "error": result.error})
+            continue
+        for feature, feature_rows in flatten_response(result.doc_id, result.response).items():
+            rows[feature].extend(feature_rows)
+    return {feature: pd.DataFrame(feature_rows) for feature, feature_rows in rows.items()}
+
+
+def display_frame(feature, items):
+    """Build the table the app shows for one feature of a single-document response."""
+    import pandas as pd
+    if feature == "relations":
+        return pd.DataFrame(flatten_relations(items))
+    df = pd.DataFrame(items)
+    if df.empty:
+        return df
+    if feature == "categories":
+        # Rename columns for better clarity
+        return df.rename(columns={"label": "Category", "score": "Confidence"})
+    display_cols = {"entities": ["text", "type", "relevance"], "keywords": ["text", "relevance"],
+                    "concepts": ["text", "relevance"]}[feature]
+    if feature in ("entities", "keywords") and "sentiment" in df.columns:
+        df["sentiment_score"] = [item["sentiment"].get("score", 0) if isinstance(item.get("sentiment"), dict) else 0
+                                 for item in items]
+        display_cols.append("sentiment_score")
+    return df.sort_values(by="relevance", ascending=False)[display_cols]
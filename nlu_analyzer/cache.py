@@ -0,0 +1,162 @@
+"""Content-addressed cache for Watson NLU responses.
+
+Entries are keyed on a hash of the normalized text, the requested feature
+options, the language and the API version (``service`` stores one entry per
+feature, so results can be combined and reused). Lookups go through an
+in-memory LRU tier first and fall back to an SQLite file on disk, so repeated
+analyses survive app restarts without another round trip to Watson.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(".nlu_cache", "responses.sqlite3")
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.strip().split("\n"))
+
+
+def cache_key(text, features, language, version):
+    """Return the hex digest identifying a single ``analyze`` request."""
+    payload = json.dumps({
+        "text": normalize_text(text),
+        "features": features,
+        "language": language,
+        "version": version,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache with size and TTL based eviction.
+
+    ``path=None`` disables the disk tier. The object is thread-safe, so a
+    single instance can be shared by every session of the app.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_entries=256, max_disk_bytes=256 * 1024 * 1024,
+                 ttl=7 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "size INTEGER NOT NULL, body BLOB NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._db.commit()
+
+    key = staticmethod(cache_key)
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key):
+        """Return the cached response for ``key`` or ``None`` on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, response = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return response
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT stored_at, body FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    stored_at, body = row
+                    if not self._expired(stored_at, now):
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        response = json.loads(zlib.decompress(body).decode("utf-8"))
+                        self._remember(key, stored_at, response)
+                        self._counters["disk_hits"] += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, response):
+        """Store ``response`` in both tiers and evict what no longer fits."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            if self._db is not None:
+                body = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, stored_at, accessed_at, size, body) VALUES (?, ?, ?, ?, ?)",
+                    (key, now, now, len(body), body)
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, stored_at, response):
+        self._memory[key] = (stored_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self, now):
+        # Drop expired rows first, then the least recently used until under budget
+        if self.ttl is not None:
+            cursor = self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+            self._counters["evictions"] += max(cursor.rowcount, 0)
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self._counters["evictions"] += 1
+
+    def clear(self):
+        """Remove every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of each tier."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = 0
+            stats["disk_bytes"] = 0
+            if self._db is not None:
+                stats["disk_entries"], stats["disk_bytes"] = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,234 @@
+"""Split documents that exceed Watson's size limit and merge the chunk results.
+
+Long texts are cut on paragraph and sentence boundaries into chunks under a
+byte budget, the chunks are analyzed concurrently, and the per-chunk
+responses are merged back into a single response with the same shape as a
+normal ``analyze`` result, so the rendering code does not need to know the
+document was split.
+"""
+import contextvars
+import re
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Watson NLU rejects requests whose text is larger than 50 KB
+DEFAULT_CHUNK_BYTES = 50000
+
+_PARAGRAPH_RE = re.compile(r"(?<=\n)\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+")
+_WORD_RE = re.compile(r"(?<=\s)(?=\S)")
+
+
+def _byte_len(text):
+    return len(text.encode("utf-8"))
+
+
+def _pieces(text, max_bytes, splitters):
+    """Yield pieces of ``text`` no longer than ``max_bytes``, splitting as coarsely as possible."""
+    if _byte_len(text) <= max_bytes:
+        yield text
+        return
+    if not splitters:
+        # No boundary left: hard split on characters
+        encoded = text.encode("utf-8")
+        while encoded:
+            piece = encoded[:max_bytes].decode("utf-8", errors="ignore")
+            yield piece
+            encoded = encoded[len(piece.encode("utf-8")):]
+        return
+    pattern, rest = splitters[0], splitters[1:]
+    start = 0
+    for match in pattern.finditer(text):
+        yield from _pieces(text[start:match.end()], max_bytes, rest)
+        start = match.end()
+    yield from _pieces(text[start:], max_bytes, rest)
+
+
+def split_text(text, max_bytes=DEFAULT_CHUNK_BYTES):
+    """Split ``text`` into chunks of at most ``max_bytes`` UTF-8 bytes.
+
+    Paragraph boundaries are preferred, then sentence boundaries, then
+    whitespace; a single word larger than the budget is split on characters.
+    """
+    chunks = []
+    current = ""
+    current_bytes = 0
+    for piece in _pieces(text, max_bytes, [_PARAGRAPH_RE, _SENTENCE_RE, _WORD_RE]):
+        piece_bytes = _byte_len(piece)
+        if current and current_bytes + piece_bytes > max_bytes:
+            chunks.append(current)
+            current, current_bytes = "", 0
+        current += piece
+        current_bytes += piece_bytes
+    if current.strip():
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def split_stream(pieces, max_bytes=DEFAULT_CHUNK_BYTES):
+    """Like ``split_text`` but over an iterable of text pieces, yielding chunks as they fill up.
+
+    Only about two chunks' worth of text is buffered at a time, so a large
+    file read with ``reader.iter_text`` never has to be held in memory.
+    """
+    buffer = ""
+    buffer_bytes = 0
+    for piece in pieces:
+        buffer += piece
+        buffer_bytes += _byte_len(piece)
+        if buffer_bytes < 2 * max_bytes:
+            continue
+        chunks = split_text(buffer, max_bytes)
+        # The last chunk may continue in the next piece, keep it in the buffer
+        buffer = chunks.pop() if chunks else ""
+        buffer_bytes = _byte_len(buffer)
+        yield from chunks
+    if buffer.strip():
+        yield from split_text(buffer, max_bytes)
+
+
+def _sentiment_label(score):
+    if score > 0:
+        return "positive"
+    if score < 0:
+        return "negative"
+    return "neutral"
+
+
+def _merge_ranked(items_per_chunk, weights, key_fn, limit, score_field="relevance"):
+    """Merge scored items across chunks.
+
+    Scores are the chunk-length weighted sum (items missing from a chunk
+    count as zero), counts are summed and sentiment is averaged weighted by
+    each mention's score.
+    """
+    merged = {}
+    for items, weight in zip(items_per_chunk, weights):
+        for item in items:
+            key = key_fn(item)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {"item": dict(item), "score": 0.0, "count": 0,
+                                       "sentiment": 0.0, "sentiment_weight": 0.0}
+            score = item.get(score_field, 0) or 0
+            entry["score"] += weight * score
+            entry["count"] += item.get("count", 1) or 0
+            if isinstance(item.get("sentiment"), dict):
+                entry["sentiment"] += score * item["sentiment"].get("score", 0)
+                entry["sentiment_weight"] += score
+            if "confidence" in item:
+                entry["item"]["confidence"] = max(entry["item"].get("confidence", 0), item["confidence"])
+
+    results = []
+    for entry in merged.values():
+        item = entry["item"]
+        item[score_field] = round(entry["score"], 6)
+        if "count" in item:
+            item["count"] = entry["count"]
+        if "sentiment" in item:
+            score = entry["sentiment"] / entry["sentiment_weight"] if entry["sentiment_weight"] else 0.0
+            item["sentiment"] = {"score": round(score, 6), "label": _sentiment_label(score)}
+        results.append(item)
+
+    results.sort(key=lambda item: item[score_field], reverse=True)
+    return results[:limit] if limit else results
+
+
+def merge_responses(responses, weights, features):
+    """Merge per-chunk ``analyze`` responses into one response.
+
+    ``weights`` give each chunk's share of the document (they should sum to
+    one) and ``features`` is the feature spec of the request, whose limits
+    are re-applied after merging.
+    """
+    if len(responses) == 1:
+        return responses[0]
+
+    merged = {}
+    languages = Counter(response.get("language") for response in responses if response.get("language"))
+    if languages:
+        merged["language"] = languages.most_common(1)[0][0]
+
+    usage = {}
+    for response in responses:
+        for field, value in response.get("usage", {}).items():
+            if field == "features":
+                usage[field] = max(usage.get(field, 0), value)
+            else:
+                usage[field] = usage.get(field, 0) + value
+    if usage:
+        merged["usage"] = usage
+
+    def limit_of(feature):
+        return features.get(feature, {}).get("limit")
+
+    def collect(field):
+        return [response.get(field, []) for response in responses]
+
+    if any("keywords" in response for response in responses):
+        merged["keywords"] = _merge_ranked(collect("keywords"), weights,
+                                           lambda item: item.get("text", "").lower(), limit_of("keywords"))
+    if any("entities" in response for response in responses):
+        merged["entities"] = _merge_ranked(collect("entities"), weights,
+                                           lambda item: (item.get("text", "").lower(), item.get("type")),
+                                           limit_of("entities"))
+    if any("concepts" in response for response in responses):
+        merged["concepts"] = _merge_ranked(collect("concepts"), weights,
+                                           lambda item: item.get("text", "").lower(), limit_of("concepts"))
+    if any("categories" in response for response in responses):
+        categories = _merge_ranked(collect("categories"), weights, lambda item: item.get("label"),
+                                   limit_of("categories"), score_field="score")
+        for category in categories:
+            category.pop("explanation", None)
+        merged["categories"] = categories
+    if any("relations" in response for response in responses):
+        seen = set()
+        relations = []
+        for chunk_relations in collect("relations"):
+            for relation in chunk_relations:
+                key = (relation.get("type"), relation.get("sentence"),
+                       tuple(arg.get("text") for arg in relation.get("arguments", [])))
+                if key not in seen:
+                    seen.add(key)
+                    relations.append(relation)
+        merged["relations"] = relations
+
+    if any("sentiment" in response for response in responses):
+        score = sum(weight * response.get("sentiment", {}).get("document", {}).get("score", 0)
+                    for response, weight in zip(responses, weights))
+        merged["sentiment"] = {"document": {"score": round(score, 6), "label": _sentiment_label(score)}}
+
+    return merged
+
+
+def analyze_chunks(analyze_fn, chunks, features, max_workers=4):
+    """Analyze an iterable of chunks concurrently and merge the responses.
+
+    At most ``2 * max_workers`` chunks are in flight, so chunks produced by
+    ``split_stream`` are released as soon as they have been analyzed.
+    """
+    responses = []
+    lengths = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            lengths.append(len(chunk))
+            # Run in a copy of the caller's context so the active ``metrics`` trace follows
+            pending.append(executor.submit(contextvars.copy_context().run, analyze_fn, chunk))
+            if len(pending) >= 2 * max_workers:
+                responses.append(pending.popleft().result())
+        responses.extend(future.result() for future in pending)
+
+    if not responses:
+        raise ValueError("No text to analyze")
+    total = sum(lengths)
+    weights = [length / total for length in lengths]
+    return merge_responses(responses, weights, features)
+
+
+def analyze_chunked(analyze_fn, text, features, max_bytes=DEFAULT_CHUNK_BYTES, max_workers=4):
+    """Analyze ``text`` with ``analyze_fn``, splitting it first if it exceeds ``max_bytes``."""
+    chunks = split_text(text, max_bytes)
+    if len(chunks) <= 1:
+        return analyze_fn(text)
+    return analyze_chunks(analyze_fn, chunks, features, min(max_workers, len(chunks)))
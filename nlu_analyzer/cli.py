@@ -0,0 +1,218 @@
+"""Command-line entry point: run the analysis pipeline without Streamlit.
+
+Example::
+
+    python -m nlu_analyzer --features keywords,entities --in docs/ --out results.jsonl
+
+Inputs are text files, zip archives and CSV/JSONL files (one document per
+row), or directories containing them. Documents are analyzed concurrently
+and written as soon as each one completes. Credentials are read from
+``IBM_WATSON_API_KEY`` and ``IBM_WATSON_URL`` (or a ``.env`` file);
+``--backend replay`` or ``synthetic`` runs without them (see ``backends``).
+"""
+import argparse
+import json
+import os
+import sys
+
+from nlu_analyzer.backends import (BACKEND_MODES, DEFAULT_FIXTURES_PATH, OfflineClient, backend_settings,
+                                   cache_path, isolated_path)
+from nlu_analyzer.batch import BATCH_FILE_TYPES, load_documents, run_batch
+from nlu_analyzer.cache import DEFAULT_CACHE_PATH, ResponseCache
+from nlu_analyzer.chunking import DEFAULT_CHUNK_BYTES
+from nlu_analyzer.dedup import DEFAULT_DEDUP_PATH, NearDuplicateIndex, request_namespace
+from nlu_analyzer.export import EXPORT_FORMATS, CombinedTableExporter, TableExporter, format_for_path
+from nlu_analyzer.pipeline import (DEFAULT_FEATURES, FEATURES, AnalysisResult, analyze, client_from_env,
+                                   feature_spec, text_statistics)
+from nlu_analyzer.scheduler import RequestScheduler
+from nlu_analyzer.service import API_VERSION
+from nlu_analyzer.store import AnalysisStore
+
+
+def iter_input_files(paths):
+    """Yield ``(name, bytes)`` for every supported file under ``paths`` ("-" reads stdin)."""
+    extensions = tuple(f".{extension}" for extension in BATCH_FILE_TYPES)
+    for path in paths:
+        if path == "-":
+            yield "stdin.txt", sys.stdin.buffer.read()
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions) and not name.startswith("."):
+                        file_path = os.path.join(root, name)
+                        with open(file_path, "rb") as f:
+                            yield os.path.relpath(file_path, path), f.read()
+        else:
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+
+
+class JsonlWriter:
+    """Writes one JSON record per document: id, statistics and the raw response."""
+
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, result):
+        record = {"doc_id": result.doc_id, "statistics": result.statistics, "response": result.response}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class TableWriter:
+    """Streams the flattened rows of each document into a ``TableExporter`` or ``CombinedTableExporter``."""
+
+    def __init__(self, exporter):
+        self._exporter = exporter
+
+    def write(self, result):
+        self._exporter.write(result.doc_id, result.response)
+
+    def close(self):
+        self._exporter.close()
+
+
+def open_writer(path, format="csv"):
+    """Pick an output writer from the ``--out`` path."""
+    if path == "-" or path.lower().endswith(".jsonl"):
+        return JsonlWriter(path)
+    if os.path.splitext(path)[1] == "":
+        return TableWriter(TableExporter(path, format))
+    if format_for_path(path) is not None:
+        return TableWriter(CombinedTableExporter(path))
+    raise ValueError(f"Unsupported output '{path}': use a .jsonl file, '-', a "
+                     f"{'/'.join(EXPORT_FORMATS.values())} file for one table of every feature "
+                     f"or a directory for one table per feature")
+
+
+def parse_limits(values):
+    limits = {}
+    for value in values:
+        feature, _, limit = value.partition("=")
+        if not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid limit '{value}', expected FEATURE=N")
+        limits[feature.strip()] = int(limit)
+    return limits
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m nlu_analyzer",
+                                     description="Analyze documents with IBM Watson NLU without the Streamlit UI.")
+    parser.add_argument("--in", dest="inputs", nargs="+", required=True, metavar="PATH",
+                        help="Input files or directories (txt, zip, csv, jsonl); '-' reads one document from stdin")
+    parser.add_argument("--out", required=True,
+                        help="Output .jsonl file ('-' for stdout), a .parquet, .arrow, .csv or .ndjson file "
+                             "for one table of every feature, or a directory for one table per feature")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv",
+                        help="File format of the per-feature tables when --out is a directory")
+    parser.add_argument("--features", default=",".join(DEFAULT_FEATURES),
+                        help=f"Comma-separated features to extract ({', '.join(FEATURES)})")
+    parser.add_argument("--limit", action="append", default=[], metavar="FEATURE=N",
+                        help="Per-feature result limit, e.g. --limit keywords=20 (repeatable)")
+    parser.add_argument("--language", default=None, help="Language of the texts (detected when omitted)")
+    parser.add_argument("--text-column", default="text", help="Column/field holding the text in CSV/JSONL inputs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents analyzed in parallel")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second")
+    parser.add_argument("--retries", type=int, default=5,
+                        help="Retries of throttled, failed or timed out requests (with exponential backoff)")
+    parser.add_argument("--deadline", type=float, default=120.0,
+                        help="Seconds a request may take including retries")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES,
+                        help="Split longer documents into chunks of at most this many bytes")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Response cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Always call Watson, bypassing the response cache")
+    parser.add_argument("--dedup", nargs="?", const=DEFAULT_DEDUP_PATH, metavar="PATH",
+                        help="Reuse the response of a near-duplicate document seen in this or earlier runs "
+                             f"(index file, default {DEFAULT_DEDUP_PATH})")
+    parser.add_argument("--dedup-threshold", type=float, default=0.9,
+                        help="Minimum estimated Jaccard similarity of word shingles for --dedup")
+    parser.add_argument("--backend", choices=BACKEND_MODES,
+                        help="Watson, Watson while recording fixtures, replayed fixtures or synthetic responses "
+                             "(default: NLU_BACKEND, else live)")
+    parser.add_argument("--fixtures", metavar="DIR",
+                        help=f"Fixtures directory of the record and replay backends (default {DEFAULT_FIXTURES_PATH})")
+    parser.add_argument("--store", metavar="PATH",
+                        help="Also record every result in this analysis store (see the app's Analysis history)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        features = feature_spec([name.strip() for name in args.features.split(",") if name.strip()],
+                                parse_limits(args.limit))
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    backend_options = {name: value for name, value in (("mode", args.backend), ("fixtures", args.fixtures)) if value}
+    try:
+        client = client_from_env(**backend_options)
+        mode = args.backend or backend_settings()["mode"]
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    # Opened only once the client is up, so a failed start leaves an existing output untouched
+    try:
+        writer = open_writer(args.out, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    # Replayed and synthetic responses get their own cache and dedup index; recording bypasses the cache
+    cache_file = None if args.no_cache else cache_path(args.cache, mode)
+    cache = ResponseCache(cache_file) if cache_file else None
+    store = AnalysisStore(args.store) if args.store else None
+    store_run = store.start_run(features, args.language) if store else None
+
+    def documents():
+        for name, data in iter_input_files(args.inputs):
+            yield from load_documents(name, data, args.text_column)
+
+    scheduler = RequestScheduler(rate=args.rate, max_retries=args.retries, deadline=args.deadline)
+
+    dedup = NearDuplicateIndex(isolated_path(args.dedup, mode)) if args.dedup else None
+    namespace = request_namespace(features, args.language, API_VERSION)
+
+    def analyze_text(text):
+        return analyze(text, features, language=args.language, client=client, cache=cache,
+                       max_bytes=args.chunk_bytes, scheduler=scheduler)
+
+    def analyze_document(text):
+        if dedup is None:
+            return analyze_text(text)
+        response, _ = dedup.analyze(text, namespace, lambda text: analyze_text(text).response, args.dedup_threshold)
+        return AnalysisResult(None, response, text_statistics(text, args.language))
+
+    analyzed = failed = 0
+    try:
+        for batch_result in run_batch(analyze_document, documents(), max_workers=args.concurrency):
+            if batch_result.error is not None:
+                failed += 1
+                print(f"{batch_result.doc_id}: {batch_result.error}", file=sys.stderr)
+                continue
+            result = batch_result.response._replace(doc_id=batch_result.doc_id)
+            writer.write(result)
+            if store is not None:
+                store.save(store_run, result.doc_id, result.response, result.statistics)
+            analyzed += 1
+            if analyzed % 100 == 0:
+                print(f"Analyzed {analyzed} documents", file=sys.stderr)
+    finally:
+        writer.close()
+
+    stats = scheduler.stats()
+    print(f"Done: {analyzed} analyzed, {failed} failed "
+          f"({stats['requests']} requests, {stats['retries']} retries, "
+          f"{stats['throttle_wait_seconds']:.1f} s throttled)", file=sys.stderr)
+    if isinstance(client, OfflineClient):
+        backend_stats = client.stats()
+        print(f"Backend {mode}: {backend_stats['replayed']} replayed, {backend_stats['synthetic']} synthetic, "
+              f"{backend_stats['errors']} failed", file=sys.stderr)
+    if dedup is not None:
+        dedup_stats = dedup.stats()
+        print(f"Near-duplicates: {dedup_stats['duplicates']} calls and {dedup_stats['units_saved']} text units saved",
+              file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,121 @@
+"""Construction of long-lived, connection-pooled Watson NLU clients.
+
+The app keeps one client per (API key, service URL) for the whole process,
+so the IAM token and the keep-alive connections of its ``requests`` session
+are reused across Streamlit reruns and sessions.
+"""
+import threading
+import time
+
+from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+from ibm_cloud_sdk_core.http_adapter import SSLHTTPAdapter
+from ibm_watson import NaturalLanguageUnderstandingV1
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from nlu_analyzer.service import API_VERSION
+
+
+class ConnectionStats:
+    """Thread-safe counters for new connections opened by a client."""
+
+    def __init__(self):
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return self.connections, self.connect_seconds
+
+
+class _TimedConnectMixin:
+    stats = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+
+class PooledHTTPAdapter(SSLHTTPAdapter):
+    """The SDK's ``SSLHTTPAdapter`` (TLS 1.2 minimum) with larger pools, timing connects into a ``ConnectionStats``."""
+
+    def __init__(self, stats, pool_maxsize=16, **kwargs):
+        self.stats = stats
+        super().__init__(pool_connections=4, pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {"stats": self.stats}
+        http_connection = type("TimedHTTPConnection", (_TimedConnectMixin, HTTPConnection), attrs)
+        https_connection = type("TimedHTTPSConnection", (_TimedConnectMixin, HTTPSConnection), attrs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("TimedHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http_connection}),
+            "https": type("TimedHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": https_connection}),
+        }
+
+
+def create_client(api_key, url, pool_maxsize=16, iam_url=None):
+    """Build an NLU client with a pooled session and an already fetched IAM token.
+
+    ``iam_url`` overrides the IAM endpoint, e.g. to point at the local fake
+    server. The returned client has a ``connection_stats`` attribute.
+    """
+    if iam_url:
+        authenticator = IAMAuthenticator(api_key, url=iam_url)
+    else:
+        authenticator = IAMAuthenticator(api_key)
+    client = NaturalLanguageUnderstandingV1(version=API_VERSION, authenticator=authenticator)
+    client.set_service_url(url)
+
+    client.connection_stats = ConnectionStats()
+    adapter = PooledHTTPAdapter(client.connection_stats, pool_maxsize=pool_maxsize,
+                                _disable_ssl_verification=client.disable_ssl_verification)
+    client.http_client.mount("https://", adapter)
+    # Plain HTTP (the local fake endpoint) ignores the SSL context but still gets the pooling and timing
+    client.http_client.mount("http://", adapter)
+
+    refresh_token(client)
+    return client
+
+
+def refresh_token(client):
+    """Make sure the client holds a valid IAM token and return the seconds spent.
+
+    The SDK token manager fetches a new token once the current one is past
+    its refresh time (well before it expires), so calling this before each
+    request keeps the exchange out of the ``analyze`` round trip.
+    """
+    token_manager = getattr(client.authenticator, "token_manager", None)
+    if token_manager is None:
+        return 0.0
+    start = time.perf_counter()
+    token_manager.get_token()
+    return time.perf_counter() - start
+
+
+def timed_call(client, fn, /, *args, **kwargs):
+    """Run ``fn`` and return ``(result, timings)`` split into token/connect/analyze seconds."""
+    timings = {"token": refresh_token(client)}
+    stats = getattr(client, "connection_stats", None)
+    connections, connect_seconds = stats.snapshot() if stats else (0, 0.0)
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    if stats:
+        new_connections, new_connect_seconds = stats.snapshot()
+        timings["connections"] = new_connections - connections
+        timings["connect"] = new_connect_seconds - connect_seconds
+    else:
+        timings["connections"] = 0
+        timings["connect"] = 0.0
+    timings["analyze"] = max(elapsed - timings["connect"], 0.0)
+    return result, timings
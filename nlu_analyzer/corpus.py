@@ -0,0 +1,294 @@
+"""Corpus-level aggregates over many analyzed documents.
+
+``CorpusAggregator.add`` folds one response at a time into running counters,
+so corpus views never re-concatenate per-document DataFrames:
+
+- per entity (text and type) and per keyword: documents, mentions, summed
+  relevance and a sentiment histogram, in numpy arrays indexed by term;
+- entity co-occurrence (documents mentioning both) as a sparse COO matrix:
+  pair codes ``i << 32 | j`` with counts, merged in sorted numpy arrays;
+- documents per category and day, for trends over time.
+
+Memory is bounded: beyond ``max_terms`` terms of a kind the least frequent
+quarter is evicted (with their co-occurrences), beyond ``max_pairs`` pairs
+the rarest are dropped, and only the last ``max_periods`` days of categories
+are kept. Rankings of frequent terms stay exact; rare terms may be
+undercounted, as in other heavy-hitter sketches.
+"""
+import threading
+import time
+
+import numpy as np
+
+# Sentiment histogram bins (upper bounds of the first four; the last bin takes the rest)
+SENTIMENT_BINS = ["very negative", "negative", "neutral", "positive", "very positive"]
+_SENTIMENT_EDGES = np.array([-0.6, -0.2, 0.2, 0.6])
+
+# Entities per document (by relevance) that enter the co-occurrence matrix
+PAIR_ENTITIES = 25
+
+# Pair codes buffered before they are merged into the matrix
+_PAIR_BUFFER = 200000
+
+_DAY = 86400
+
+
+class _Terms:
+    """Running counters of one kind of term (entities or keywords), indexed by term id."""
+
+    def __init__(self, capacity=1024):
+        self.index = {}
+        self.keys = []
+        self.labels = []
+        self.documents = np.zeros(capacity, dtype=np.int64)
+        self.mentions = np.zeros(capacity, dtype=np.int64)
+        self.relevance = np.zeros(capacity, dtype=np.float64)
+        self.sentiment = np.zeros(capacity, dtype=np.float64)
+        self.sentiment_bins = np.zeros((capacity, len(SENTIMENT_BINS)), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def ids(self, keys, labels):
+        """Term ids of ``keys``, adding (and growing the arrays for) new ones."""
+        ids = []
+        for key, label in zip(keys, labels):
+            term_id = self.index.get(key)
+            if term_id is None:
+                term_id = self.index[key] = len(self.labels)
+                self.keys.append(key)
+                self.labels.append(label)
+            ids.append(term_id)
+        if len(self.labels) > len(self.documents):
+            self._resize(max(len(self.labels), 2 * len(self.documents)))
+        return np.array(ids, dtype=np.int64)
+
+    def _resize(self, capacity):
+        for name in ("documents", "mentions", "relevance", "sentiment", "sentiment_bins"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            count = min(len(old), capacity)
+            new[:count] = old[:count]
+            setattr(self, name, new)
+
+    def add(self, ids, mentions, relevance, sentiment):
+        # Ids are unique within a document, so plain fancy-index updates are safe
+        self.documents[ids] += 1
+        self.mentions[ids] += mentions
+        self.relevance[ids] += relevance
+        scored = ~np.isnan(sentiment)
+        self.sentiment[ids[scored]] += sentiment[scored]
+        self.sentiment_bins[ids[scored], np.searchsorted(_SENTIMENT_EDGES, sentiment[scored])] += 1
+
+    def keep(self, kept):
+        """Keep only the terms ``kept`` (sorted ids), renumbered from 0; return the old -> new id map."""
+        remap = np.full(len(self.labels), -1, dtype=np.int64)
+        remap[kept] = np.arange(len(kept))
+        kept_ids = kept.tolist()
+        self.keys = [self.keys[i] for i in kept_ids]
+        self.labels = [self.labels[i] for i in kept_ids]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        for name in ("documents", "mentions", "relevance", "sentiment", "sentiment_bins"):
+            array = getattr(self, name)
+            setattr(self, name, array[kept].copy())
+        self._resize(max(1024, 2 * len(kept)))
+        return remap
+
+
+class CorpusAggregator:
+    """Incremental entity, keyword, co-occurrence and category aggregates; thread-safe."""
+
+    def __init__(self, max_terms=200000, max_pairs=2000000, max_periods=366, period=_DAY):
+        self.max_terms = max_terms
+        self.max_pairs = max_pairs
+        self.max_periods = max_periods
+        self.period = period
+        self.documents = 0
+        self.mentions = 0
+        self._terms = {"entities": _Terms(), "keywords": _Terms()}
+        self._pair_codes = np.zeros(0, dtype=np.int64)
+        self._pair_counts = np.zeros(0, dtype=np.int64)
+        self._pair_buffer = []
+        self._buffered = 0
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def add(self, response, timestamp=None):
+        """Fold one ``analyze`` response into the aggregates (``timestamp`` dates its categories)."""
+        with self._lock:
+            self.documents += 1
+            for kind in ("entities", "keywords"):
+                columns = _columns(kind, response.get(kind) or [])
+                if columns is None:
+                    continue
+                keys, labels, mentions, relevance, sentiment = columns
+                terms = self._terms[kind]
+                ids = terms.ids(keys, labels)
+                terms.add(ids, mentions, relevance, sentiment)
+                self.mentions += int(mentions.sum())
+                if kind == "entities":
+                    self._add_pairs(ids[np.argsort(-relevance, kind="stable")[:PAIR_ENTITIES]])
+                if len(terms) > self.max_terms:
+                    self._evict(kind)
+
+            categories = response.get("categories") or []
+            if categories:
+                day = int((timestamp if timestamp is not None else time.time()) // self.period) * self.period
+                counts = self._categories.setdefault(day, {})
+                for label in {category.get("label") for category in categories if category.get("label")}:
+                    counts[label] = counts.get(label, 0) + 1
+                while len(self._categories) > self.max_periods:
+                    del self._categories[min(self._categories)]
+
+    def _add_pairs(self, ids):
+        if len(ids) < 2:
+            return
+        ids = np.sort(ids)
+        first, second = np.triu_indices(len(ids), k=1)
+        self._pair_buffer.append((ids[first] << 32) | ids[second])
+        self._buffered += len(first)
+        if self._buffered >= _PAIR_BUFFER:
+            self._merge_pairs()
+
+    def _merge_pairs(self):
+        if not self._pair_buffer:
+            return
+        codes = np.concatenate([self._pair_codes] + self._pair_buffer)
+        counts = np.concatenate([self._pair_counts, np.ones(self._buffered, dtype=np.int64)])
+        self._pair_buffer = []
+        self._buffered = 0
+        # Sum duplicate pair codes, as a COO -> CSR conversion would
+        self._pair_codes, inverse = np.unique(codes, return_inverse=True)
+        self._pair_counts = np.bincount(inverse, weights=counts, minlength=len(self._pair_codes)).astype(np.int64)
+        if len(self._pair_codes) > self.max_pairs:
+            kept = np.sort(np.argsort(-self._pair_counts, kind="stable")[:self.max_pairs * 3 // 4])
+            self._pair_codes = self._pair_codes[kept]
+            self._pair_counts = self._pair_counts[kept]
+
+    def _evict(self, kind):
+        terms = self._terms[kind]
+        count = len(terms)
+        score = terms.documents[:count] + terms.relevance[:count] / max(self.documents, 1)
+        kept = np.sort(np.argsort(-score, kind="stable")[:self.max_terms * 3 // 4])
+        remap = terms.keep(kept)
+        if kind != "entities":
+            return
+        self._merge_pairs()
+        first = remap[self._pair_codes >> 32]
+        second = remap[self._pair_codes & 0xFFFFFFFF]
+        valid = (first >= 0) & (second >= 0)
+        # Renumbering keeps the order of kept ids, so pairs stay sorted and i < j
+        self._pair_codes = (first[valid] << 32) | second[valid]
+        self._pair_counts = self._pair_counts[valid]
+
+    def top_terms(self, kind="entities", limit=20, by="documents"):
+        """Terms ranked ``by`` documents, mentions or summed relevance: ``[{text, type, documents, ...}]``."""
+        with self._lock:
+            terms = self._terms[kind]
+            count = len(terms)
+            if not count:
+                return []
+            key = {"documents": terms.documents, "mentions": terms.mentions, "relevance": terms.relevance}[by]
+            order = np.lexsort((-terms.relevance[:count], -key[:count]))[:limit]
+            rows = []
+            for i in order:
+                scored = terms.sentiment_bins[i].sum()
+                text, entity_type = terms.labels[i]
+                row = {"text": text}
+                if kind == "entities":
+                    row["type"] = entity_type
+                row.update({"documents": int(terms.documents[i]), "mentions": int(terms.mentions[i]),
+                            "relevance": round(float(terms.relevance[i]), 4),
+                            "avg_relevance": round(float(terms.relevance[i] / terms.documents[i]), 4),
+                            "avg_sentiment": round(float(terms.sentiment[i] / scored), 4) if scored else None})
+                rows.append(row)
+            return rows
+
+    def sentiment_distribution(self, kind="entities", limit=20):
+        """Documents per sentiment bin for the ``limit`` most frequent terms."""
+        with self._lock:
+            terms = self._terms[kind]
+            count = len(terms)
+            order = np.lexsort((-terms.relevance[:count], -terms.documents[:count]))[:limit]
+            rows = []
+            for i in order:
+                text, entity_type = terms.labels[i]
+                row = {"text": text, "type": entity_type} if kind == "entities" else {"text": text}
+                row.update(zip(SENTIMENT_BINS, (int(n) for n in terms.sentiment_bins[i])))
+                rows.append(row)
+            return rows
+
+    def cooccurrence(self, limit=20):
+        """Entity pairs mentioned together in the most documents: ``[{entity, other, documents}]``."""
+        with self._lock:
+            self._merge_pairs()
+            labels = self._terms["entities"].labels
+            order = np.argsort(-self._pair_counts, kind="stable")[:limit]
+            return [{"entity": _label(labels[self._pair_codes[i] >> 32]),
+                     "other": _label(labels[self._pair_codes[i] & 0xFFFFFFFF]),
+                     "documents": int(self._pair_counts[i])} for i in order]
+
+    def cooccurrence_matrix(self, limit=15):
+        """``(labels, matrix)``: co-occurrence counts among the ``limit`` most frequent entities."""
+        with self._lock:
+            self._merge_pairs()
+            terms = self._terms["entities"]
+            count = len(terms)
+            top = np.sort(np.lexsort((-terms.relevance[:count], -terms.documents[:count]))[:limit])
+            position = np.full(count, -1, dtype=np.int64)
+            position[top] = np.arange(len(top))
+            first = position[self._pair_codes >> 32] if count else np.zeros(0, dtype=np.int64)
+            second = position[self._pair_codes & 0xFFFFFFFF] if count else np.zeros(0, dtype=np.int64)
+            inside = (first >= 0) & (second >= 0)
+            matrix = np.zeros((len(top), len(top)), dtype=np.int64)
+            matrix[first[inside], second[inside]] = self._pair_counts[inside]
+            matrix += matrix.T
+            return [_label(terms.labels[i]) for i in top], matrix
+
+    def category_trends(self, limit=10):
+        """Documents per day for the ``limit`` most frequent categories: ``[{day, category, documents}]``."""
+        with self._lock:
+            totals = {}
+            for counts in self._categories.values():
+                for label, n in counts.items():
+                    totals[label] = totals.get(label, 0) + n
+            top = sorted(totals, key=totals.get, reverse=True)[:limit]
+            return [{"day": day, "category": label, "documents": self._categories[day].get(label, 0)}
+                    for day in sorted(self._categories) for label in top]
+
+    def stats(self):
+        """Documents, mentions, terms per kind, co-occurring pairs and bytes held by the arrays."""
+        with self._lock:
+            self._merge_pairs()
+            array_bytes = self._pair_codes.nbytes + self._pair_counts.nbytes + sum(
+                terms.documents.nbytes + terms.mentions.nbytes + terms.relevance.nbytes + terms.sentiment.nbytes
+                + terms.sentiment_bins.nbytes for terms in self._terms.values())
+            return {"documents": self.documents, "mentions": self.mentions,
+                    "entities": len(self._terms["entities"]), "keywords": len(self._terms["keywords"]),
+                    "pairs": len(self._pair_codes), "array_bytes": array_bytes}
+
+
+def _columns(kind, items):
+    """``(keys, labels, mentions, relevance, sentiment)`` of the distinct terms in ``items``, or ``None``."""
+    rows = {}
+    for item in items:
+        text = item.get("text") or ""
+        entity_type = item.get("type") if kind == "entities" else None
+        key = (text.casefold(), entity_type) if kind == "entities" else text.casefold()
+        # A response lists each term once, but merged chunk responses may repeat one
+        if key in rows:
+            continue
+        sentiment = item.get("sentiment")
+        score = sentiment.get("score") if isinstance(sentiment, dict) else None
+        rows[key] = ((text, entity_type), item.get("count") or 1, item.get("relevance") or 0.0,
+                     np.nan if score is None else score)
+    if not rows:
+        return None
+    labels, mentions, relevance, sentiment = zip(*rows.values())
+    return (list(rows), labels, np.array(mentions, dtype=np.int64), np.array(relevance, dtype=np.float64),
+            np.array(sentiment, dtype=np.float64))
+
+
+def _label(label):
+    text, entity_type = label
+    return f"{text} ({entity_type})" if entity_type else text
@@ -0,0 +1,221 @@
+"""Near-duplicate detection in front of the ``analyze`` call.
+
+Re-posted, lightly edited copies of a document are recognized with MinHash
+signatures over word shingles and locality-sensitive hashing (LSH): each
+signature is cut into bands, and documents sharing a band bucket are
+candidates whose estimated Jaccard similarity is then checked against the
+threshold. A match reuses the canonical document's response instead of
+calling Watson. The index lives in SQLite, so it works across runs and
+memory stays flat however many fingerprints it holds; the oldest documents
+are evicted beyond ``max_documents``.
+
+Exact repeats are already served by the response cache; this catches the
+copies that differ by a few words.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from nlu_analyzer.cache import normalize_text
+
+DEFAULT_DEDUP_PATH = os.path.join(".nlu_cache", "dedup.sqlite3")
+
+# A stored document similar enough to the one being analyzed
+Match = namedtuple("Match", ["key", "similarity", "response", "units"])
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Shingles hashed per block, so huge documents do not need a (num_perm x shingles) matrix
+_BLOCK = 8192
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    response BLOB NOT NULL,
+    units INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    bucket INTEGER NOT NULL,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket);
+CREATE INDEX IF NOT EXISTS buckets_document ON buckets (document_id);
+"""
+
+
+def request_namespace(features, language, version):
+    """Identify the requests whose responses are interchangeable (same features, language and version)."""
+    payload = json.dumps({"features": features, "language": language, "version": version}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def shingles(text, size=5):
+    """Overlapping ``size``-word shingles of the normalized, case-folded text."""
+    words = _WORD_RE.findall(normalize_text(text).casefold())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def lsh_bands(threshold, num_perm):
+    """Pick ``(bands, rows)`` so a pair at ``threshold`` similarity becomes a candidate with >= 95% probability.
+
+    More rows per band mean fewer false candidates, so the largest row count
+    that still keeps recall at the threshold is chosen.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= 0.95:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index of analyzed documents and their responses; thread-safe.
+
+    ``min_threshold`` fixes the banding when the index is created (stored
+    with it); lookups may ask for any threshold at or above it.
+    """
+
+    def __init__(self, path=DEFAULT_DEDUP_PATH, min_threshold=0.7, num_perm=128, shingle_size=5,
+                 max_documents=1000000, seed=1):
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.max_documents = max_documents
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "duplicates": 0, "units_saved": 0}
+        with self._lock:
+            self._db.execute("PRAGMA foreign_keys = ON")
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.executescript(_SCHEMA)
+            # The first configuration wins, so signatures stay comparable across runs
+            config = {"min_threshold": min_threshold, "num_perm": num_perm, "shingle_size": shingle_size,
+                      "seed": seed}
+            stored = self._db.execute("SELECT value FROM meta WHERE name = 'config'").fetchone()
+            if stored is None:
+                self._db.execute("INSERT INTO meta VALUES ('config', ?)", (json.dumps(config),))
+                self._db.commit()
+            else:
+                config = json.loads(stored[0])
+            self._documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+        self.min_threshold = config["min_threshold"]
+        self.num_perm = config["num_perm"]
+        self.shingle_size = config["shingle_size"]
+        self.bands, self.rows = lsh_bands(self.min_threshold, self.num_perm)
+        generator = np.random.RandomState(config["seed"])
+        self._a = generator.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)[:, None]
+        self._b = generator.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        """MinHash signature (``num_perm`` uint32 values) of the text's shingles."""
+        return self._signature(shingles(text, self.shingle_size))
+
+    def _signature(self, text_shingles):
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in text_shingles), dtype=np.uint64)
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), _BLOCK):
+            block = hashes[None, start:start + _BLOCK]
+            permuted = ((self._a * block + self._b) % _PRIME) & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _buckets(self, signature, namespace):
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8,
+                                     person=f"{band}".encode("ascii"), salt=namespace.encode("ascii")[:16])
+            buckets.append(int.from_bytes(digest.digest(), "big", signed=True))
+        return buckets
+
+    def find(self, signature, namespace, threshold=None):
+        """Return the most similar stored ``Match`` at or above ``threshold``, or ``None``."""
+        threshold = max(threshold or self.min_threshold, self.min_threshold)
+        buckets = self._buckets(signature, namespace)
+        with self._lock:
+            self._counters["lookups"] += 1
+            placeholders = ",".join("?" * len(buckets))
+            rows = self._db.execute(
+                f"SELECT id, key, signature FROM documents WHERE id IN "
+                f"(SELECT DISTINCT document_id FROM buckets WHERE bucket IN ({placeholders}))", buckets
+            ).fetchall()
+        best = None
+        for document_id, key, stored in rows:
+            similarity = float(np.mean(np.frombuffer(stored, dtype=np.uint32) == signature))
+            if similarity >= threshold and (best is None or similarity > best[2]):
+                best = (document_id, key, similarity)
+        if best is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT response, units FROM documents WHERE id = ?", (best[0],)).fetchone()
+        if row is None:
+            return None
+        return Match(best[1], best[2], json.loads(zlib.decompress(row[0]).decode("utf-8")), row[1])
+
+    def add(self, key, signature, namespace, response):
+        """Store a freshly analyzed document as the canonical copy for its near-duplicates."""
+        body = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        units = (response.get("usage") or {}).get("text_units", 1)
+        buckets = self._buckets(signature, namespace)
+        with self._lock, self._db:
+            document_id = self._db.execute(
+                "INSERT INTO documents (key, signature, response, units, added_at) VALUES (?, ?, ?, ?, ?)",
+                (key, signature.tobytes(), body, units, time.time())
+            ).lastrowid
+            self._db.executemany("INSERT INTO buckets VALUES (?, ?)", [(bucket, document_id) for bucket in buckets])
+            self._documents += 1
+            if self._documents > self.max_documents:
+                excess = self._documents - self.max_documents
+                self._db.execute("DELETE FROM documents WHERE id IN (SELECT id FROM documents ORDER BY id LIMIT ?)",
+                                 (excess,))
+                self._documents -= excess
+
+    def analyze(self, text, namespace, analyze_fn, threshold=None):
+        """Return ``(response, match)``: the canonical response for a near-duplicate, else ``analyze_fn(text)``.
+
+        ``match`` is ``None`` when Watson was called and the text became a
+        new canonical document. Texts without any words are neither looked up
+        nor indexed: their signatures would all be equal.
+        """
+        text_shingles = shingles(text, self.shingle_size)
+        if not text_shingles:
+            return analyze_fn(text), None
+        signature = self._signature(text_shingles)
+        match = self.find(signature, namespace, threshold)
+        if match is not None:
+            with self._lock:
+                self._counters["duplicates"] += 1
+                self._counters["units_saved"] += match.units
+            return match.response, match
+        response = analyze_fn(text)
+        key = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:16]
+        self.add(key, signature, namespace, response)
+        return response, None
+
+    def stats(self):
+        """Lookups, duplicates found (calls saved), text units saved and indexed documents."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["documents"] = self._documents
+        return stats
@@ -0,0 +1,238 @@
+"""Streaming export of the flattened result tables.
+
+``TableExporter`` writes one file per feature (keywords, entities, concepts,
+categories, relations) in the table shapes of ``pipeline.FEATURE_COLUMNS``,
+as CSV, newline-delimited JSON, Parquet or Arrow IPC; ``CombinedTableExporter``
+writes the rows of every feature to a single file instead, tagged by a
+``feature`` column. Rows are buffered per table and written ``batch_rows``
+at a time, so exporting 100k documents only ever holds one batch per table
+in memory. In Parquet and Arrow the
+type/label columns are dictionary-encoded against a vocabulary that grows
+across batches (Arrow files get dictionary deltas).
+
+Parquet and Arrow need ``pyarrow``.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from nlu_analyzer.pipeline import FEATURE_COLUMNS, flatten_response
+
+# Format name -> file extension
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv", "ndjson": ".ndjson"}
+
+# Columns of the combined table: the feature of each row, then every feature's columns
+COMBINED_COLUMNS = ["feature"] + list(dict.fromkeys(column for columns in FEATURE_COLUMNS.values()
+                                                    for column in columns))
+
+# Low-cardinality columns stored dictionary-encoded in Parquet and Arrow
+DICTIONARY_COLUMNS = {"feature", "type", "Category", "Relation Type"}
+
+_FLOAT_COLUMNS = {"relevance", "sentiment_score", "Confidence"}
+_INTEGER_COLUMNS = {"count"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow exports need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def _check_format(format):
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{format}', expected one of: {', '.join(EXPORT_FORMATS)}")
+
+
+def _open_sink(path, columns, format):
+    if format in ("parquet", "arrow"):
+        return _ArrowSink(path, columns, format)
+    return (_CsvSink if format == "csv" else _NdjsonSink)(path, columns)
+
+
+def format_for_path(path):
+    """Export format implied by the extension of ``path``, ``None`` if there is none."""
+    extension = os.path.splitext(path)[1].lower()
+    return next((format for format, suffix in EXPORT_FORMATS.items() if suffix == extension), None)
+
+
+class _CsvSink:
+    def __init__(self, path, columns):
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _NdjsonSink:
+    def __init__(self, path, columns):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self._file.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowSink:
+    """Parquet or Arrow IPC file written one record batch at a time."""
+
+    def __init__(self, path, columns, format):
+        pa = _import_pyarrow()
+        self._pa = pa
+        self._columns = columns
+        self._vocabularies = {column: {} for column in columns if column in DICTIONARY_COLUMNS}
+        self.schema = pa.schema([(column, self._type(column)) for column in columns])
+        if format == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema,
+                                           options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def _type(self, column):
+        pa = self._pa
+        if column in DICTIONARY_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        if column in _FLOAT_COLUMNS:
+            return pa.float64()
+        if column in _INTEGER_COLUMNS:
+            return pa.int64()
+        return pa.string()
+
+    def _array(self, column, values):
+        pa = self._pa
+        if column not in self._vocabularies:
+            return pa.array(values, type=self._type(column))
+        # Indices into a vocabulary that only grows, so every batch's dictionary
+        # extends the previous one
+        vocabulary = self._vocabularies[column]
+        indices = [None if value is None else vocabulary.setdefault(value, len(vocabulary)) for value in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()),
+                                              pa.array(list(vocabulary), type=pa.string()))
+
+    def write(self, rows):
+        arrays = [self._array(column, [row.get(column) for row in rows]) for column in self._columns]
+        self._writer.write_batch(self._pa.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class TableExporter:
+    """Writes the flattened tables of many responses to ``directory``, one file per feature.
+
+    Use it as a context manager, or call ``close`` to flush the last batches;
+    ``paths`` maps each feature to its file.
+    """
+
+    def __init__(self, directory, format="parquet", batch_rows=10000):
+        _check_format(format)
+        os.makedirs(directory, exist_ok=True)
+        self.batch_rows = batch_rows
+        self.paths = {feature: os.path.join(directory, feature + EXPORT_FORMATS[format]) for feature in FEATURE_COLUMNS}
+        self._buffers = {feature: [] for feature in FEATURE_COLUMNS}
+        self._sinks = {feature: _open_sink(self.paths[feature], columns, format)
+                       for feature, columns in FEATURE_COLUMNS.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, doc_id, response):
+        """Add the rows of one response."""
+        for feature, rows in flatten_response(doc_id, response).items():
+            self.write_rows(feature, rows)
+
+    def write_rows(self, feature, rows):
+        """Add already flattened rows (dicts keyed by ``FEATURE_COLUMNS[feature]``)."""
+        buffer = self._buffers[feature]
+        buffer.extend(rows)
+        if len(buffer) >= self.batch_rows:
+            self._flush(feature)
+
+    def write_frame(self, feature, df):
+        """Add the rows of a DataFrame shaped like ``results_to_frames`` output, a batch at a time."""
+        for start in range(0, len(df), self.batch_rows):
+            batch = df.iloc[start:start + self.batch_rows]
+            # Missing values are NaN in a DataFrame but None in flattened rows
+            self.write_rows(feature, batch.astype(object).where(batch.notna(), None).to_dict("records"))
+
+    def _flush(self, feature):
+        if self._buffers[feature]:
+            self._sinks[feature].write(self._buffers[feature])
+            self._buffers[feature] = []
+
+    def close(self):
+        for feature, sink in self._sinks.items():
+            self._flush(feature)
+            sink.close()
+
+
+class CombinedTableExporter:
+    """Writes the flattened tables of many responses to the single file ``path``.
+
+    Rows keep the columns of their feature (``COMBINED_COLUMNS`` lists them
+    all, other columns are empty) and name it in ``feature``; ``format``
+    defaults to the one of the file extension. Use it as a context manager,
+    or call ``close`` to flush the last batch.
+    """
+
+    def __init__(self, path, format=None, batch_rows=10000):
+        format = format or format_for_path(path)
+        _check_format(format)
+        self.path = path
+        self.batch_rows = batch_rows
+        self._buffer = []
+        self._sink = _open_sink(path, COMBINED_COLUMNS, format)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, doc_id, response):
+        """Add the rows of one response."""
+        for feature, rows in flatten_response(doc_id, response).items():
+            self._buffer.extend({"feature": feature, **row} for row in rows)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._sink.write(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._sink.close()
+
+
+def export_zip(responses=None, frames=None, format="parquet", batch_rows=10000):
+    """Export ``(doc_id, response)`` pairs or per-feature DataFrames and return a zip archive as bytes."""
+    with tempfile.TemporaryDirectory() as directory:
+        with TableExporter(directory, format, batch_rows) as exporter:
+            for doc_id, response in responses or ():
+                exporter.write(doc_id, response)
+            for feature, df in (frames or {}).items():
+                if feature in FEATURE_COLUMNS:
+                    exporter.write_frame(feature, df)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in exporter.paths.values():
+                zf.write(path, os.path.basename(path))
+        return archive.getvalue()
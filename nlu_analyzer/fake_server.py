@@ -0,0 +1,189 @@
+"""Local HTTP stand-in for the Watson NLU ``/v1/analyze`` endpoint.
+
+Useful for exercising the cache, batch and retry paths without credentials:
+
+    python -m nlu_analyzer.fake_server --port 8765 --latency 0.2 --error-rate 0.1
+
+then point the app at ``http://127.0.0.1:8765`` as a custom service URL.
+The server also answers IAM token requests on ``/identity/token`` so an
+``IAMAuthenticator(api_key, url="http://127.0.0.1:8765")`` works against it.
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORD_RE = re.compile(r"[^\W\d_]{4,}", re.UNICODE)
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def fake_token(lifetime=3600):
+    """Return an unsigned JWT the SDK token manager can decode."""
+    now = int(time.time())
+    return ".".join([_b64({"alg": "HS256", "typ": "JWT"}), _b64({"iat": now, "exp": now + lifetime}), "c2lnbmF0dXJl"])
+
+
+def fake_analysis(text, features, language="en"):
+    """Build a deterministic response shaped like a real ``analyze`` result."""
+    words = Counter(word.lower() for word in _WORD_RE.findall(text))
+    ranked = words.most_common()
+    top = ranked[0][1] if ranked else 1
+    response = {
+        "usage": {"text_units": max(1, -(-len(text) // 10000)), "text_characters": len(text), "features": len(features)},
+        "language": language or "en",
+    }
+    if "keywords" in features:
+        limit = features["keywords"].get("limit", 50)
+        response["keywords"] = [
+            {"text": word, "relevance": round(count / top, 6), "count": count,
+             "sentiment": {"score": 0.0, "label": "neutral"}}
+            for word, count in ranked[:limit]
+        ]
+    if "entities" in features:
+        limit = features["entities"].get("limit", 50)
+        capitalized = Counter(re.findall(r"\b[A-Z][a-z]{2,}\b", text))
+        response["entities"] = [
+            {"type": "Organization", "text": word, "relevance": round(count / top, 6), "count": count,
+             "confidence": 0.9, "sentiment": {"score": 0.0, "label": "neutral"}}
+            for word, count in capitalized.most_common(limit)
+        ]
+    if "concepts" in features:
+        limit = features["concepts"].get("limit", 8)
+        response["concepts"] = [
+            {"text": word.title(), "relevance": round(count / top, 6),
+             "dbpedia_resource": f"http://dbpedia.org/resource/{word.title()}"}
+            for word, count in ranked[:limit]
+        ]
+    if "categories" in features:
+        limit = features["categories"].get("limit", 3)
+        response["categories"] = [
+            {"score": round(0.9 / (rank + 1), 6), "label": f"/{word}"}
+            for rank, (word, _) in enumerate(ranked[:limit])
+        ]
+    if "relations" in features:
+        response["relations"] = []
+    return response
+
+
+class FakeWatsonHandler(BaseHTTPRequestHandler):
+    """Request handler; behaviour is configured through ``self.server``."""
+
+    # Keep-alive, like the real service
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.startswith("/identity/token"):
+            self._send_json(200, {"access_token": fake_token(), "refresh_token": "", "token_type": "Bearer",
+                                  "expires_in": 3600, "expiration": int(time.time()) + 3600})
+            return
+        if "/v1/analyze" not in self.path:
+            self._send_json(404, {"code": 404, "error": "Not found"})
+            return
+
+        self.server.record_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status = self.server.injected_error()
+        if status:
+            headers = {"Retry-After": str(self.server.retry_after)} if status in (429, 503) else None
+            self._send_json(status, {"code": status, "error": "Injected error"}, headers)
+            return
+        request = json.loads(body or b"{}")
+        self._send_json(200, fake_analysis(request.get("text", ""), request.get("features", {}),
+                                           request.get("language")))
+
+
+class FakeWatsonServer(ThreadingHTTPServer):
+    """Threaded fake Watson server with injected latency, errors and a request counter.
+
+    A fraction ``error_rate`` of analyze requests (plus the next ``fail_next``
+    ones) are answered with ``error_status``; 429 and 503 responses carry a
+    ``Retry-After`` of ``retry_after`` seconds.
+    """
+
+    daemon_threads = True
+    # Room for benchmarks opening hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, error_status=429, retry_after=1,
+                 seed=None):
+        super().__init__((host, port), FakeWatsonHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.fail_next = 0
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def injected_error(self):
+        """Status code to fail the current request with, or ``None``."""
+        with self._count_lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+            elif not (self.error_rate and self._random.random() < self.error_rate):
+                return None
+            self.error_count += 1
+            return self.error_status
+
+    def start(self):
+        """Serve from a background thread and return ``self``."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local fake Watson NLU endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each analyze response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of analyze requests that fail")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429/503")
+    args = parser.parse_args(argv)
+
+    server = FakeWatsonServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                              error_status=args.error_status, retry_after=args.retry_after)
+    print(f"Fake Watson NLU listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Target-keyword matching for the result tables.
+
+A ``KeywordMatcher`` compiles the whole keyword list into one regular
+expression (prefixes shared as a trie, so a thousand keywords stay fast) and
+applies it to DataFrame columns as a vectorized boolean mask instead of a
+Python loop per row and keyword.
+"""
+import re
+from functools import lru_cache
+
+MATCH_MODES = {
+    "Whole word": "word",
+    "Substring": "substring",
+    "Stemmed": "stem",
+}
+
+HIGHLIGHT_CSS = "background-color: rgba(16, 185, 129, 0.1)"
+
+# Styling every cell of a huge table costs more than it helps; larger
+# tables get a boolean "Target" column instead
+MAX_STYLED_CELLS = 200000
+
+# Longest first, so "ations" is stripped before "s"; "ies"/"ied" leave an "i"
+# behind, like the final "y" of the base word
+_SUFFIXES = sorted(["ational", "ization", "fulness", "ousness", "iveness", "ations", "ation", "ments", "ment",
+                    "ness", "ings", "ing", "edly", "ies", "ied", "ed", "es", "ly", "er", "s", "e"],
+                   key=len, reverse=True)
+_WORDS_RE = re.compile(r"\w+")
+
+
+def stem(word):
+    """Strip a common English suffix, keeping at least three characters.
+
+    A final "y" becomes "i", so "city" and "cities" share the stem "citi"
+    and a final "e" is dropped, so "analyze" and "analyzed" share "analyz".
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                return word + "i"
+            break
+    if word.endswith("y") and len(word) > 3:
+        return word[:-1] + "i"
+    return word
+
+
+def _trie_pattern(words):
+    """Return a regex alternation matching exactly ``words``, with common prefixes factored out."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        optional = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if optional else pattern
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Case-folded matcher for a list of target keywords.
+
+    ``mode`` is ``"word"`` (whole words or phrases), ``"substring"`` (anywhere
+    in the text) or ``"stem"`` (whole words with the same stem as the
+    keyword's, so "analyze" also matches "analyzed" and "city" "cities").
+    In stem mode ``regex`` only finds candidates; their stems are compared
+    by ``matches_stem``.
+    """
+
+    def __init__(self, keywords, mode="word"):
+        self.keywords = [kw.casefold() for kw in keywords if kw.strip()]
+        self.mode = mode
+        self.stems = {tuple(stem(word) for word in _WORDS_RE.findall(keyword)) for keyword in self.keywords}
+        self.stems.discard(())
+        self._stems_by_first = {}
+        for stems in self.stems:
+            self._stems_by_first.setdefault(stems[0], []).append(stems)
+        self.regex = re.compile(self._pattern()) if self.keywords else None
+
+    def _pattern(self):
+        if self.mode == "substring":
+            return _trie_pattern(self.keywords)
+        if self.mode == "stem":
+            # Candidates: words starting like each stem (minus an "i" that may be a "y"), in a phrase
+            phrases = {r"\s+".join(re.escape(word[:-1] if word.endswith("i") else word) + r"\w*" for word in stems)
+                       for stems in self.stems}
+            return r"(?<!\w)(?:" + "|".join(sorted(phrases, key=len, reverse=True) or ["(?!)"]) + r")(?!\w)"
+        return r"(?<!\w)" + _trie_pattern(self.keywords) + r"(?!\w)"
+
+    def matches_stem(self, text):
+        """Whether a run of words in the case-folded ``text`` has the stems of a keyword."""
+        stems = [stem(word) for word in _WORDS_RE.findall(text)]
+        for i, first in enumerate(stems):
+            for keyword in self._stems_by_first.get(first, ()):
+                if tuple(stems[i:i + len(keyword)]) == keyword:
+                    return True
+        return False
+
+    def mask(self, df, columns):
+        """Boolean array, True for rows where any of ``columns`` matches a keyword."""
+        # numpy comes with the DataFrame; importing it here keeps it out of app startup
+        import numpy as np
+        result = np.zeros(len(df), dtype=bool)
+        if self.regex is None:
+            return result
+        for column in columns:
+            if column in df.columns:
+                values = df[column].astype("string").str.casefold()
+                found = values.str.contains(self.regex, na=False).to_numpy(dtype=bool)
+                if self.mode == "stem" and found.any():
+                    # Only the (few) candidate rows are stemmed word by word
+                    candidates = np.flatnonzero(found)
+                    found[candidates] = [self.matches_stem(text) for text in values.iloc[candidates]]
+                result |= found
+        return result
+
+
+@lru_cache(maxsize=32)
+def get_matcher(keywords, mode="word"):
+    """Return a shared ``KeywordMatcher`` for a tuple of keywords (built once per list)."""
+    return KeywordMatcher(keywords, mode)
+
+
+def highlight(df, matcher, columns):
+    """Return ``df`` ready for ``st.dataframe`` with matching rows highlighted.
+
+    Small tables get a Styler with the matching rows shaded green; larger
+    ones get a leading boolean ``Target`` column instead.
+    """
+    import numpy as np
+    mask = matcher.mask(df, columns)
+    if df.size > MAX_STYLED_CELLS:
+        df = df.copy()
+        df.insert(0, "Target", mask)
+        return df
+    styles = np.where(mask[:, None], HIGHLIGHT_CSS, "")
+    styles = np.broadcast_to(styles, df.shape)
+    return df.style.apply(lambda frame: styles, axis=None)
@@ -0,0 +1,298 @@
+"""Process-wide job queue shared by every session of the app.
+
+Sessions ``submit`` work to one ``JobQueue`` and poll the returned ``Job``
+instead of calling Watson from their own script thread:
+
+- single-flight: a job submitted under the ``key`` of a job that is still
+  queued or running is coalesced into it, so identical requests from
+  different users cost one Watson call;
+- fairness: workers take jobs round-robin across users, and no user runs
+  more than ``max_running_per_user`` jobs at once, so a large batch cannot
+  starve interactive users;
+- quotas: a user with ``max_queued_per_user`` jobs outstanding is refused
+  with ``QuotaExceeded``.
+
+``BatchJobs`` feeds a batch into the queue a window of documents at a time.
+Queue depth, wait times and the coalescing rate are reported by ``stats``.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from nlu_analyzer.batch import BatchResult
+
+
+class QuotaExceeded(Exception):
+    """Raised by ``JobQueue.submit`` when a user already has too many jobs outstanding."""
+
+
+class Job:
+    """One unit of work in a ``JobQueue``, shared by every submission coalesced into it."""
+
+    def __init__(self, key, user, fn, limit=None):
+        self.key = key
+        self.user = user
+        self.fn = fn
+        self.limit = limit
+        self.submissions = 1
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._result = None
+        self._error = None
+        self._callbacks = []
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (or ``timeout`` seconds passed); return whether it has."""
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """Return what the job's function returned, re-raising its exception."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Job has not finished yet")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def add_done_callback(self, callback):
+        """Call ``callback(job)`` once the job has finished (right away if it has)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, result, error):
+        with self._lock:
+            self._result = result
+            self._error = error
+            self.status = "failed" if error is not None else "done"
+            self.finished_at = time.time()
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class JobQueue:
+    """Runs submitted jobs on ``workers`` threads, fairly across users; thread-safe."""
+
+    def __init__(self, workers=8, max_running_per_user=None, max_queued_per_user=64, wait_samples=10000):
+        self.workers = workers
+        self.max_running_per_user = max_running_per_user or max(1, workers // 2)
+        self.max_queued_per_user = max_queued_per_user
+        self._queues = OrderedDict()
+        self._running = Counter()
+        self._inflight = {}
+        self._waits = deque(maxlen=wait_samples)
+        self._counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._condition = threading.Condition()
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"nlu-job-{number}", daemon=True).start()
+
+    def submit(self, user, key, fn, limit=None, retry=False):
+        """Queue ``fn()`` for ``user`` and return its ``Job``.
+
+        A job with the same ``key`` that is still queued or running is returned
+        instead (``None`` never coalesces). ``limit`` further caps how many of
+        this user's jobs run at once while this one is next in line. ``retry``
+        marks the resubmission of a job refused with ``QuotaExceeded``, which
+        was already counted as submitted and rejected.
+        """
+        with self._condition:
+            if not retry:
+                self._counters["submitted"] += 1
+            job = self._inflight.get(key) if key is not None else None
+            if job is not None:
+                job.submissions += 1
+                self._counters["coalesced"] += 1
+                return job
+            outstanding = len(self._queues.get(user, ())) + self._running[user]
+            if outstanding >= self.max_queued_per_user:
+                if not retry:
+                    self._counters["rejected"] += 1
+                raise QuotaExceeded(f"{outstanding} jobs already queued or running for this user "
+                                    f"(limit {self.max_queued_per_user})")
+            job = Job(key, user, fn, limit)
+            self._queues.setdefault(user, deque()).append(job)
+            if key is not None:
+                self._inflight[key] = job
+            self._condition.notify_all()
+            return job
+
+    def position(self, job):
+        """Jobs ahead of ``job`` in its user's queue plus those of other users, 0 once it runs."""
+        with self._condition:
+            if job.status != "queued":
+                return 0
+            queue = self._queues.get(job.user, ())
+            ahead = next((i for i, queued in enumerate(queue) if queued is job), len(queue))
+            others = sum(min(len(jobs), ahead + 1) for user, jobs in self._queues.items() if user != job.user)
+            return ahead + others
+
+    def _next(self):
+        # Round-robin: the first user (in turn order) with an eligible job, then that user goes last
+        for user, queue in self._queues.items():
+            limit = self.max_running_per_user
+            if queue[0].limit:
+                limit = min(limit, queue[0].limit)
+            if self._running[user] < limit:
+                job = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(user)
+                else:
+                    del self._queues[user]
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next()
+                self._running[job.user] += 1
+                job.status = "running"
+                job.started_at = time.time()
+                self._waits.append(job.started_at - job.submitted_at)
+            try:
+                result, error = job.fn(), None
+            except Exception as e:
+                result, error = None, e
+            with self._condition:
+                self._running[job.user] -= 1
+                if not self._running[job.user]:
+                    del self._running[job.user]
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                self._counters["failed" if error is not None else "completed"] += 1
+                # A slot of this user freed up, so one of its queued jobs may now be eligible
+                self._condition.notify_all()
+            job._finish(result, error)
+
+    def stats(self):
+        """Counters, queue depth, coalescing rate, p50/p95 queue wait (seconds) and per-user load."""
+        with self._condition:
+            stats = dict(self._counters)
+            stats["workers"] = self.workers
+            stats["queued"] = sum(len(queue) for queue in self._queues.values())
+            stats["running"] = sum(self._running.values())
+            users = set(self._queues) | set(self._running)
+            stats["users"] = [{"user": user, "queued": len(self._queues.get(user, ())),
+                               "running": self._running[user]} for user in sorted(users)]
+            waits = sorted(self._waits)
+        stats["coalescing_rate"] = stats["coalesced"] / stats["submitted"] if stats["submitted"] else 0.0
+        for percentile in (50, 95):
+            stats[f"wait_p{percentile}"] = waits[min(len(waits) - 1, len(waits) * percentile // 100)] if waits else None
+        return stats
+
+
+class BatchJobs:
+    """A batch of documents run through a ``JobQueue`` without blocking the submitting session.
+
+    At most ``window`` documents are queued at once (topped up as each one
+    finishes) and ``poll`` returns the ``BatchResult`` of documents finished
+    since the last call. ``key_fn(text)`` gives the coalescing key of a
+    document and ``limit`` caps how many of them run at once (throttling is
+    left to the ``RequestScheduler`` of ``analyze_fn``). An error reading ``documents``
+    stops the batch and is raised by the next ``poll``.
+    """
+
+    def __init__(self, queue, user, analyze_fn, documents, key_fn=None, window=8, limit=None):
+        self.queue = queue
+        self.user = user
+        self.analyze_fn = analyze_fn
+        self.key_fn = key_fn
+        self.window = window
+        self.limit = limit
+        self.submitted = 0
+        self.finished = []
+        self.error = None
+        self._documents = iter(documents)
+        self._held = None
+        self._exhausted = False
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.top_up()
+
+    def top_up(self):
+        """Submit documents until ``window`` are outstanding (or the user's quota is reached)."""
+        submitted = []
+        with self._lock:
+            while not self._exhausted and self._pending < self.window:
+                retry = self._held is not None
+                try:
+                    if retry:
+                        (doc_id, text), self._held = self._held, None
+                    else:
+                        doc_id, text = next(self._documents)
+                except StopIteration:
+                    self._exhausted = True
+                    break
+                except Exception as e:
+                    # Also reached from worker threads (via ``_finish``), so never raised here
+                    self.error = e
+                    self._exhausted = True
+                    break
+                try:
+                    job = self.queue.submit(self.user, self.key_fn(text) if self.key_fn else None,
+                                            lambda text=text: self.analyze_fn(text), limit=self.limit,
+                                            retry=retry)
+                except QuotaExceeded:
+                    # Retried when one of this batch's jobs finishes, or at the next poll
+                    self._held = (doc_id, text)
+                    break
+                self._pending += 1
+                self.submitted += 1
+                submitted.append((doc_id, job))
+        # Outside the lock: a job that already finished calls back right away
+        for doc_id, job in submitted:
+            job.add_done_callback(lambda job, doc_id=doc_id: self._finish(doc_id, job))
+
+    def _finish(self, doc_id, job):
+        try:
+            result = BatchResult(doc_id, job.result(), None)
+        except Exception as e:
+            result = BatchResult(doc_id, None, str(e))
+        with self._lock:
+            self._pending -= 1
+            self.finished.append(result)
+        self.top_up()
+
+    def poll(self):
+        """Return the results finished since the last call."""
+        self.top_up()
+        if self.error is not None:
+            raise self.error
+        with self._lock:
+            results, self.finished = self.finished, []
+        return results
+
+    @property
+    def total(self):
+        """Number of documents in the batch, ``None`` until ``documents`` has been read to the end."""
+        with self._lock:
+            return self.submitted if self._exhausted and self._held is None else None
+
+    @property
+    def done(self):
+        with self._lock:
+            return self._exhausted and not self._pending and not self.finished
+
+
+def queue_settings(env=os.environ):
+    """``JobQueue`` options from ``NLU_QUEUE_WORKERS``, ``NLU_QUEUE_USER_SHARE`` and ``NLU_QUEUE_USER_QUOTA``."""
+    share = env.get("NLU_QUEUE_USER_SHARE")
+    return {
+        "workers": int(env.get("NLU_QUEUE_WORKERS") or 8),
+        "max_running_per_user": int(share) if share else None,
+        "max_queued_per_user": int(env.get("NLU_QUEUE_USER_QUOTA") or 64),
+    }
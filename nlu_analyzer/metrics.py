@@ -0,0 +1,255 @@
+"""Stage timings for the analysis hot path.
+
+A ``Trace`` collects spans (name, duration and attributes such as payload
+bytes or row counts) for one analysis, e.g. one click of Analyze. Code that
+does not know about the trace (``service`` sending requests, possibly from
+chunk worker threads) records into the active trace through ``span``.
+Every span is also aggregated into the process-wide ``REGISTRY``, which
+renders as Prometheus text. Traces can be appended to a JSONL log or sent
+to an OpenTelemetry collector over OTLP/HTTP, in the background with
+``OtlpExporter``.
+"""
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets (seconds) for stage durations
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("nlu_trace", default=None)
+
+
+class MetricsRegistry:
+    """Process-wide, thread-safe duration histograms and byte counters per stage."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, size=None):
+        with self._lock:
+            metric = self._stages.setdefault(stage, {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0,
+                                                     "bytes": 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    metric["buckets"][i] += 1
+                    break
+            metric["count"] += 1
+            metric["sum"] += seconds
+            metric["bytes"] += size or 0
+
+    def prometheus_text(self, prefix="nlu_analyzer"):
+        """Render every stage in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {stage: dict(metric, buckets=list(metric["buckets"])) for stage, metric in self._stages.items()}
+        lines = [f"# HELP {prefix}_stage_duration_seconds Time spent in each stage of the analysis.",
+                 f"# TYPE {prefix}_stage_duration_seconds histogram"]
+        for stage, metric in sorted(stages.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, metric["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {metric["count"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {metric["sum"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {metric["count"]}')
+        lines += [f"# HELP {prefix}_stage_bytes_total Payload bytes handled by each stage.",
+                  f"# TYPE {prefix}_stage_bytes_total counter"]
+        for stage, metric in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_bytes_total{{stage="{stage}"}} {metric["bytes"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="nlu_analyzer"):
+        """Write ``prometheus_text`` atomically, e.g. for node_exporter's textfile collector."""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(prefix))
+        os.replace(temporary, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Trace:
+    """Spans recorded for one analysis; safe to add to from several threads."""
+
+    def __init__(self, name="analysis", registry=REGISTRY):
+        self.name = name
+        self.registry = registry
+        self.trace_id = os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, start=None, **attributes):
+        """Record a span measured elsewhere (``start`` is a Unix timestamp)."""
+        span = {"name": name, "span_id": os.urandom(8).hex(),
+                "start": start if start is not None else time.time() - seconds,
+                "duration": seconds, "attributes": attributes}
+        with self._lock:
+            self.spans.append(span)
+        self.registry.observe(name, seconds, attributes.get("bytes"))
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the ``with`` block; the yielded dict takes attributes known only afterwards."""
+        start = time.time()
+        began = time.perf_counter()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.add(name, time.perf_counter() - began, start, **attributes)
+
+    @contextmanager
+    def activate(self):
+        """Make this the trace ``span`` records into for the ``with`` block."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def summary(self):
+        """Per-stage totals in the order stages first occurred: ``[{stage, count, seconds, bytes, rows}]``."""
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for span in spans:
+            total = totals.setdefault(span["name"], {"stage": span["name"], "count": 0, "seconds": 0.0, "bytes": 0,
+                                                    "rows": 0})
+            total["count"] += 1
+            total["seconds"] += span["duration"]
+            total["bytes"] += span["attributes"].get("bytes") or 0
+            total["rows"] += span["attributes"].get("rows") or 0
+        return list(totals.values())
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {"trace_id": self.trace_id, "name": self.name, "started": self.started, "spans": spans}
+
+
+@contextmanager
+def span(name, **attributes):
+    """Like ``Trace.span`` on the active trace; only aggregated into ``REGISTRY`` when none is active."""
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace.span(name, **attributes) as span_attributes:
+            yield span_attributes
+        return
+    began = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - began, attributes.get("bytes"))
+
+
+def append_jsonl(trace, path, **fields):
+    """Append the trace as one JSON line (with extra ``fields`` such as a deployment label)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(dict(trace.to_dict(), **fields), ensure_ascii=False) + "\n")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(trace, service_name="nlu-analyzer"):
+    """Encode the trace as an OTLP/JSON ``ExportTraceServiceRequest`` with one root span."""
+    def encode(name, span_id, start, duration, attributes, parent=None):
+        span = {
+            "traceId": trace.trace_id, "spanId": span_id, "name": name, "kind": 1,
+            "startTimeUnixNano": str(int(start * 1e9)), "endTimeUnixNano": str(int((start + duration) * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+                           if value is not None],
+        }
+        if parent:
+            span["parentSpanId"] = parent
+        return span
+
+    spans = trace.to_dict()["spans"]
+    ended = max([s["start"] + s["duration"] for s in spans], default=trace.started)
+    encoded = [encode(trace.name, trace.span_id, trace.started, ended - trace.started, {})]
+    encoded += [encode(s["name"], s["span_id"], s["start"], s["duration"], s["attributes"], trace.span_id)
+                for s in spans]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "nlu_analyzer"}, "spans": encoded}],
+    }]}
+
+
+def _post_otlp(endpoint, payload, timeout):
+    import requests
+    response = requests.post(endpoint, json=payload, timeout=timeout)
+    response.raise_for_status()
+
+
+def export_otlp(trace, endpoint="http://localhost:4318/v1/traces", service_name="nlu-analyzer", timeout=2.0):
+    """Send the trace to an OpenTelemetry collector's OTLP/HTTP endpoint."""
+    _post_otlp(endpoint, otlp_payload(trace, service_name), timeout)
+
+
+class OtlpExporter:
+    """Sends traces to an OTLP/HTTP endpoint from a background thread; thread-safe.
+
+    ``submit`` encodes the trace and returns without waiting for the
+    collector; a trace is dropped when ``max_pending`` are already waiting.
+    ``stats`` counts sent, failed and dropped traces and keeps the last error.
+    """
+
+    def __init__(self, endpoint="http://localhost:4318/v1/traces", service_name="nlu-analyzer", timeout=2.0,
+                 max_pending=100):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._pending = queue.Queue(max_pending)
+        self._counters = {"sent": 0, "failed": 0, "dropped": 0}
+        self._last_error = None
+        self._lock = threading.Lock()
+        threading.Thread(target=self._work, name="nlu-otlp", daemon=True).start()
+
+    def submit(self, trace):
+        """Queue the trace for export; it is encoded now, so later spans are not included."""
+        try:
+            self._pending.put_nowait(otlp_payload(trace, self.service_name))
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+
+    def _work(self):
+        while True:
+            payload = self._pending.get()
+            try:
+                _post_otlp(self.endpoint, payload, self.timeout)
+            except Exception as e:
+                with self._lock:
+                    self._counters["failed"] += 1
+                    self._last_error = str(e)
+            else:
+                with self._lock:
+                    self._counters["sent"] += 1
+
+    def stats(self):
+        """Counters, the number of traces waiting and the last error (``None`` if none)."""
+        with self._lock:
+            stats = dict(self._counters, last_error=self._last_error)
+        stats["pending"] = self._pending.qsize()
+        return stats
@@ -0,0 +1,171 @@
+"""Headless analysis pipeline shared by the Streamlit app and the CLI.
+
+Everything here is free of Streamlit, so it can run from cron, Airflow or
+a worker process::
+
+    from nlu_analyzer.pipeline import analyze
+    result = analyze(text, ["keywords", "entities"], {"keywords": 20}, "en")
+    result.response["keywords"]
+"""
+import os
+from collections import namedtuple
+
+from nlu_analyzer import service
+from nlu_analyzer.chunking import DEFAULT_CHUNK_BYTES
+from nlu_analyzer.textstats import TextStatistics, text_statistics
+
+# Features in the order the app lists them
+FEATURES = ["keywords", "entities", "concepts", "relations", "categories"]
+DEFAULT_FEATURES = ["keywords", "entities", "concepts", "categories"]
+DEFAULT_LIMITS = {"keywords": 10, "entities": 10, "concepts": 5, "categories": 3}
+
+# Columns of the flattened per-feature tables
+FEATURE_COLUMNS = {
+    "keywords": ["doc_id", "text", "relevance", "count", "sentiment_score"],
+    "entities": ["doc_id", "text", "type", "relevance", "count", "sentiment_score"],
+    "concepts": ["doc_id", "text", "relevance", "dbpedia_resource"],
+    "categories": ["doc_id", "Category", "Confidence"],
+    "relations": ["doc_id", "Relation Type", "Elements", "Sentence", "Confidence"],
+}
+
+AnalysisResult = namedtuple("AnalysisResult", ["doc_id", "response", "statistics"])
+
+
+def feature_spec(features=DEFAULT_FEATURES, limits=None):
+    """Build the feature spec for the enabled ``features`` with optional per-feature ``limits``."""
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    spec = {}
+    for name in features:
+        if name not in FEATURES:
+            raise ValueError(f"Unknown feature '{name}', expected one of: {', '.join(FEATURES)}")
+    if "keywords" in features:
+        spec["keywords"] = {"sentiment": True, "emotion": False, "limit": limits["keywords"]}
+    if "entities" in features:
+        spec["entities"] = {"sentiment": True, "emotion": False, "limit": limits["entities"]}
+    if "concepts" in features:
+        spec["concepts"] = {"limit": limits["concepts"]}
+    if "categories" in features:
+        spec["categories"] = {"limit": limits["categories"]}
+    if "relations" in features:
+        spec["relations"] = {}
+    return spec
+
+
+def client_from_env(env=os.environ, **backend_options):
+    """Build an NLU client from ``IBM_WATSON_API_KEY`` and ``IBM_WATSON_URL``.
+
+    A ``.env`` file in the working directory is loaded first when
+    python-dotenv is installed. ``NLU_BACKEND`` selects a recording, replaying
+    or synthetic backend instead (see ``backends.backend_settings``); replay
+    and synthetic need no credentials. ``backend_options`` (``mode``,
+    ``fixtures``, ...) override the environment.
+    """
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    from nlu_analyzer.backends import OFFLINE_MODES, backend_settings, create_backend
+    settings = dict(backend_settings(env), **backend_options)
+    api_key = env.get("IBM_WATSON_API_KEY")
+    url = env.get("IBM_WATSON_URL")
+    if settings["mode"] not in OFFLINE_MODES and (not api_key or not url):
+        raise RuntimeError("Set IBM_WATSON_API_KEY and IBM_WATSON_URL to call IBM Watson NLU "
+                           "(or NLU_BACKEND=replay or synthetic to run offline)")
+    return create_backend(api_key, url, **settings)
+
+
+def analyze(text, features=DEFAULT_FEATURES, limits=None, language=None, client=None, cache=None,
+            max_bytes=DEFAULT_CHUNK_BYTES, doc_id=None, scheduler=None):
+    """Analyze one document and return an ``AnalysisResult``.
+
+    ``features`` is either a list of feature names (combined with ``limits``)
+    or a ready-made feature spec. Without ``client`` one is built from the
+    environment (see ``client_from_env``). ``scheduler`` is an optional
+    ``scheduler.RequestScheduler`` for rate limiting and retries.
+    """
+    spec = features if isinstance(features, dict) else feature_spec(features, limits)
+    if client is None:
+        client = client_from_env()
+    response = service.analyze(client, text, spec, language, cache=cache, max_bytes=max_bytes, scheduler=scheduler)
+    return AnalysisResult(doc_id, response, text_statistics(text, language))
+
+
+def analyze_stream(pieces, features=DEFAULT_FEATURES, limits=None, language=None, client=None, cache=None,
+                   max_bytes=DEFAULT_CHUNK_BYTES, doc_id=None, scheduler=None):
+    """Like ``analyze`` for text arriving as an iterable of pieces, e.g. ``reader.iter_text(file)``.
+
+    The text is never held in memory as a whole: it is cut into chunks as it
+    is read and the statistics are accumulated along the way.
+    """
+    spec = features if isinstance(features, dict) else feature_spec(features, limits)
+    if client is None:
+        client = client_from_env()
+    statistics = TextStatistics(language)
+
+    def counted():
+        for piece in pieces:
+            statistics.update(piece)
+            yield piece
+
+    response = service.analyze_stream(client, counted(), spec, language, cache=cache, max_bytes=max_bytes,
+                                      scheduler=scheduler)
+    return AnalysisResult(doc_id, response, statistics.statistics)
+
+
+def _sentiment_score(item):
+    sentiment = item.get("sentiment")
+    return sentiment.get("score", 0) if isinstance(sentiment, dict) else None
+
+
+def flatten_relations(relations):
+    """Flatten Watson relations into the rows shown in the Relations tab."""
+    rows = []
+    for rel in relations:
+        # Extract entities involved in the relation
+        arguments = []
+        for arg in rel.get("arguments", []):
+            entity_text = arg.get("text", "")
+            entity_type = ""
+            entities = arg.get("entities", [])
+            if entities:
+                entity_type = entities[0].get("type", "")
+            arguments.append(f"{entity_text} ({entity_type})")
+
+        rows.append({
+            "Relation Type": rel.get("type", ""),
+            "Elements": " → ".join(arguments),
+            "Sentence": rel.get("sentence", ""),
+            "Confidence": rel.get("score", 0)
+        })
+    return rows
+
+
+def flatten_response(doc_id, response):
+    """Return ``{feature: [row, ...]}`` for one response, each row tagged with ``doc_id``."""
+    rows = {
+        "keywords": [
+            {"doc_id": doc_id, "text": kw.get("text"), "relevance": kw.get("relevance"),
+             "count": kw.get("count"), "sentiment_score": _sentiment_score(kw)}
+            for kw in response.get("keywords", [])
+        ],
+        "entities": [
+            {"doc_id": doc_id, "text": ent.get("text"), "type": ent.get("type"),
+             "relevance": ent.get("relevance"), "count": ent.get("count"),
+             "sentiment_score": _sentiment_score(ent)}
+            for ent in response.get("entities", [])
+        ],
+        "concepts": [
+            {"doc_id": doc_id, "text": concept.get("text"), "relevance": concept.get("relevance"),
+             "dbpedia_resource": concept.get("dbpedia_resource")}
+            for concept in response.get("concepts", [])
+        ],
+        "categories": [
+            {"doc_id": doc_id, "Category": category.get("label"), "Confidence": category.get("score")}
+            for category in response.get("categories", [])
+        ],
+        "relations": [
+            dict(doc_id=doc_id, **row) for row in flatten_relations(response.get("relations", []))
+        ],
+    }
+    return rows
@@ -0,0 +1,112 @@
+"""Incremental reading of uploaded text files.
+
+Large uploads are decoded block by block instead of being copied into one
+``bytes`` object and then one ``str``, so they can be fed straight into the
+chunked analysis path while memory use stays flat.
+"""
+import codecs
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# Checked in order: the UTF-32 LE BOM starts with the UTF-16 LE one
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def detect_encoding(sample):
+    """Guess the encoding of a file from its first bytes.
+
+    A byte order mark wins; otherwise UTF-8 is used when the sample is valid
+    UTF-8, then charset-normalizer's guess (when installed) and finally
+    cp1252, which decodes almost anything found in Western text files.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Not final: the sample may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(sample).best()
+        if best is not None:
+            return best.encoding
+    except ImportError:
+        pass
+    return "cp1252"
+
+
+def _size(fileobj):
+    position = fileobj.tell()
+    size = fileobj.seek(0, 2)
+    fileobj.seek(position)
+    return size
+
+
+def open_text(fileobj, sample_size=64 * 1024):
+    """Return ``(encoding, size_in_bytes)`` for a seekable binary file, rewound to the start."""
+    fileobj.seek(0)
+    encoding = detect_encoding(fileobj.read(sample_size))
+    fileobj.seek(0)
+    return encoding, _size(fileobj)
+
+
+def iter_text(fileobj, encoding=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield decoded text blocks from a binary file without reading it all at once.
+
+    Undecodable bytes are replaced rather than aborting the whole upload.
+    """
+    if encoding is None:
+        encoding, _ = open_text(fileobj)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _unmarked_encoding(fileobj, encoding):
+    """Return the BOM-less codec and code unit size for decoding from the middle of a file."""
+    if encoding in ("utf-16", "utf-32"):
+        fileobj.seek(0)
+        little_endian = fileobj.read(4).startswith(codecs.BOM_UTF16_LE)
+        return f"{encoding}-{'le' if little_endian else 'be'}", 2 if encoding == "utf-16" else 4
+    if encoding == "utf-8-sig":
+        return "utf-8", 1
+    return encoding, 1
+
+
+def preview(fileobj, encoding, excerpt_bytes=2000):
+    """Return ``(head, tail, size_in_bytes)`` excerpts of a seekable binary file.
+
+    ``tail`` is empty when the whole file fits in the head excerpt. The file
+    is rewound afterwards.
+    """
+    size = _size(fileobj)
+    fileobj.seek(0)
+    head = fileobj.read(excerpt_bytes).decode(encoding, errors="ignore")
+    tail = ""
+    if size > 2 * excerpt_bytes:
+        # The tail may start inside a character; errors="ignore" drops the partial one
+        tail_encoding, unit = _unmarked_encoding(fileobj, encoding)
+        fileobj.seek((size - excerpt_bytes) // unit * unit)
+        tail = fileobj.read().decode(tail_encoding, errors="ignore")
+    elif size > excerpt_bytes:
+        fileobj.seek(0)
+        head = fileobj.read().decode(encoding, errors="ignore")
+    fileobj.seek(0)
+    return head, tail, size
@@ -0,0 +1,240 @@
+"""Resilient scheduling of Watson NLU requests.
+
+``RequestScheduler`` sits between the app and ``client.analyze``: a token
+bucket keeps the request rate within the Watson plan, throttled (429),
+server (5xx) and network errors are retried with exponential backoff and
+jitter (honoring ``Retry-After``) until a per-request deadline, and a
+circuit breaker fails fast while the service is degraded. Counters and
+latency percentiles are kept for the UI.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# The SDK's own timeout when a request is sent without one
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Watson while the circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request cannot complete (or be retried) before its deadline."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Wait for a token and return the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now (possibly going negative) and sleep outside the lock
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+            if deadline is not None and now + wait > deadline:
+                self._tokens += 1
+                raise DeadlineExceeded("Rate limit wait would exceed the request deadline")
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and probes again after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now (one probe at a time while half-open)."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half-open"
+            if self.state == "half-open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return self.state != "open"
+
+    def release(self):
+        """Give back the probe ``allow`` handed out when no request was sent after all."""
+        with self._lock:
+            self._probing = False
+
+    def retry_in(self):
+        with self._lock:
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half-open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def _retry_after(error):
+    """Seconds from a ``Retry-After`` header, if the error carries one."""
+    response = getattr(error, "http_response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _classify(error):
+    """Return ``(retryable, counts_as_service_failure)`` for an exception."""
+    # Imported here, on the error path, to keep the SDK and requests out of app startup
+    import requests
+    from ibm_cloud_sdk_core import ApiException
+
+    if isinstance(error, ApiException):
+        if error.code == 429:
+            return True, False
+        if error.code >= 500:
+            return True, True
+        return False, False
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True, True
+    return False, False
+
+
+class RequestScheduler:
+    """Rate-limits, retries and times calls to Watson; safe to share between threads."""
+
+    def __init__(self, rate=10.0, burst=None, max_retries=5, base_delay=0.5, max_delay=30.0, deadline=120.0,
+                 breaker=None, latency_samples=10000, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=latency_samples)
+        self._counters = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttled": 0,
+                          "throttle_wait_seconds": 0.0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def backoff(self, attempt, retry_after=None):
+        """Delay before retry number ``attempt`` (0-based): full jitter, at least ``Retry-After``."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def call(self, fn, *args, deadline=None, timeout_argument=None, **kwargs):
+        """Call ``fn(*args, **kwargs)`` under the rate limit, retry policy and breaker.
+
+        ``deadline`` is the time budget in seconds for this request including
+        retries (defaults to the scheduler's ``deadline``). With
+        ``timeout_argument``, each attempt also gets that keyword argument set
+        to the seconds left in the budget (at most ``request_timeout``), so a
+        hanging call cannot outlive it.
+        """
+        budget = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + budget if budget else None
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected")
+                if attempt:
+                    self._count("failed")
+                raise CircuitOpenError(f"Watson NLU looks degraded, not sending requests for the next "
+                                       f"{self.breaker.retry_in():.0f}s")
+            try:
+                if self.bucket is not None:
+                    waited = self.bucket.acquire(expires)
+                    if waited:
+                        self._count("throttled")
+                        self._count("throttle_wait_seconds", waited)
+                if timeout_argument is not None:
+                    timeout = self.request_timeout
+                    if expires is not None:
+                        remaining = expires - time.monotonic()
+                        if remaining <= 0:
+                            self._count("failed" if attempt else "rejected")
+                            raise DeadlineExceeded(f"No time left in the request deadline after {attempt} attempts")
+                        timeout = min(timeout, remaining) if timeout else remaining
+                    kwargs[timeout_argument] = timeout
+            except BaseException:
+                # Nothing was sent, so a half-open breaker must not keep waiting for this probe
+                self.breaker.release()
+                raise
+
+            self._count("requests")
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable, service_failure = _classify(e)
+                if service_failure:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if not retryable or attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                delay = self.backoff(attempt, _retry_after(e))
+                if expires is not None and time.monotonic() + delay > expires:
+                    self._count("failed")
+                    raise DeadlineExceeded(f"Gave up after {attempt + 1} attempts: {e}") from e
+                if getattr(e, "code", None) == 429:
+                    self._count("throttled")
+                    self._count("throttle_wait_seconds", delay)
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+            self.breaker.record_success()
+            self._count("succeeded")
+            return result
+
+    def stats(self):
+        """Counters, breaker state and p50/p95/p99 latency (seconds) of successful calls."""
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+        stats["breaker"] = self.breaker.state
+        for percentile in (50, 95, 99):
+            stats[f"p{percentile}"] = (latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)]
+                                       if latencies else None)
+        return stats
+
+
+def scheduler_settings(env=os.environ):
+    """``RequestScheduler`` options from ``NLU_RATE_LIMIT`` (requests per second, 0 for none)."""
+    rate = env.get("NLU_RATE_LIMIT")
+    return {"rate": float(rate) if rate else 10.0}
@@ -0,0 +1,143 @@
+"""Thin layer between the app and the Watson NLU ``analyze`` endpoint."""
+import json
+
+from nlu_analyzer import metrics
+from nlu_analyzer.chunking import DEFAULT_CHUNK_BYTES, analyze_chunked, analyze_chunks, split_stream
+
+# API version used for every request (also part of the cache key)
+API_VERSION = "2022-04-07"
+
+# Maps the feature names used in a feature spec to the SDK option classes (by name, so the
+# SDK is only imported once a request is built)
+FEATURE_OPTIONS = {
+    "keywords": "KeywordsOptions",
+    "entities": "EntitiesOptions",
+    "concepts": "ConceptsOptions",
+    "categories": "CategoriesOptions",
+    "relations": "RelationsOptions",
+    "sentiment": "SentimentOptions",
+}
+
+
+def build_features(spec):
+    """Build the SDK ``Features`` object from a feature spec.
+
+    A feature spec is a plain dict such as
+    ``{"keywords": {"limit": 10, "sentiment": True}, "relations": {}}``.
+    Keeping it JSON-serializable lets it double as part of the cache key.
+    """
+    from ibm_watson import natural_language_understanding_v1 as sdk
+    return sdk.Features(**{name: getattr(sdk, FEATURE_OPTIONS[name])(**options) for name, options in spec.items()})
+
+
+def analyze(client, text, features, language, cache=None, max_bytes=None, max_workers=4, scheduler=None):
+    """Analyze ``text`` with the given feature spec, going through ``cache`` if set.
+
+    Results are cached per feature, so only features that are not cached yet
+    are sent to Watson and fully cached requests never touch the network.
+    Texts larger than ``max_bytes`` are split into chunks that are analyzed
+    (and cached) concurrently and merged back into a single response.
+    Requests go through ``scheduler`` (a ``scheduler.RequestScheduler``) when
+    given, for rate limiting and retries.
+    """
+    def analyze_one(chunk):
+        return _analyze_request(client, chunk, features, language, cache, scheduler)
+
+    if max_bytes and len(text.encode("utf-8")) > max_bytes:
+        return analyze_chunked(analyze_one, text, features, max_bytes, max_workers)
+    return analyze_one(text)
+
+
+def analyze_stream(client, pieces, features, language, cache=None, max_bytes=DEFAULT_CHUNK_BYTES, max_workers=4,
+                   scheduler=None):
+    """Analyze text arriving as an iterable of pieces (e.g. ``reader.iter_text``).
+
+    The pieces are re-cut into chunks of at most ``max_bytes`` and analyzed as
+    they are produced, then merged like ``analyze`` does for long texts.
+    """
+    def analyze_one(chunk):
+        return _analyze_request(client, chunk, features, language, cache, scheduler)
+
+    return analyze_chunks(analyze_one, split_stream(pieces, max_bytes), features, max_workers)
+
+
+def _analyze_request(client, text, features, language, cache, scheduler=None):
+    """Send one ``analyze`` request, reusing cached results feature by feature.
+
+    Each feature's result is cached under (text, feature, options without the
+    limit, language, version) together with the limit it was fetched with.
+    Only features that are missing, or cached with a smaller limit, are
+    requested from Watson; a cached result fetched with a larger limit is
+    truncated instead.
+    """
+    if cache is None:
+        return _request(client, text, features, language, scheduler)
+
+    keys = {name: _feature_key(cache, text, name, options, language) for name, options in features.items()}
+    cached = {}
+    missing = {}
+    for name, options in features.items():
+        entry = cache.get(keys[name])
+        if entry is not None and _covers(entry, options.get("limit")):
+            cached[name] = entry
+        else:
+            missing[name] = options
+
+    fresh = _request(client, text, missing, language, scheduler) if missing else None
+    if fresh is not None:
+        for name, options in missing.items():
+            cached[name] = {"limit": options.get("limit"), "language": fresh.get("language"),
+                            "usage": fresh.get("usage"), "result": fresh.get(name, [])}
+            cache.set(keys[name], cached[name])
+
+    # Reassemble a response shaped like a single request for every feature
+    first = next(iter(cached.values()), {})
+    response = {}
+    usage = fresh.get("usage") if fresh is not None else first.get("usage")
+    if usage is not None:
+        response["usage"] = dict(usage, features=len(features))
+    language_detected = fresh.get("language") if fresh is not None else first.get("language")
+    if language_detected is not None:
+        response["language"] = language_detected
+    for name, options in features.items():
+        result = cached[name]["result"]
+        limit = options.get("limit")
+        response[name] = result[:limit] if limit and isinstance(result, list) else result
+    return response
+
+
+def _feature_key(cache, text, name, options, language):
+    options = {option: value for option, value in options.items() if option != "limit"}
+    return cache.key(text, {name: options}, language, API_VERSION)
+
+
+def _covers(entry, limit):
+    """Whether a cached feature result can serve a request for ``limit`` results."""
+    cached_limit = entry["limit"]
+    if cached_limit is None:
+        return True
+    # Fewer results than were asked for means Watson had no more to give
+    exhausted = isinstance(entry["result"], list) and len(entry["result"]) < cached_limit
+    return exhausted or (limit is not None and limit <= cached_limit)
+
+
+def _request(client, text, features, language, scheduler=None):
+    def send(**options):
+        # Stream the body so the round trip, the download and the JSON parse are timed separately
+        with metrics.span("request", bytes=len(text.encode("utf-8"))) as attributes:
+            response = client.analyze(
+                text=text,
+                features=build_features(features),
+                language=language,
+                stream=True,
+                **options
+            ).get_result()
+            attributes["status"] = response.status_code
+        with metrics.span("download") as attributes:
+            body = response.content
+            attributes["bytes"] = len(body)
+        with metrics.span("parse", bytes=len(body)):
+            return json.loads(body)
+
+    # The scheduler passes the time left in the request's deadline on as its timeout
+    return scheduler.call(send, timeout_argument="timeout") if scheduler is not None else send()
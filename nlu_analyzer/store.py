@@ -0,0 +1,224 @@
+"""Persistent, indexed store of past analyses.
+
+Every response is normalized into SQLite tables (one per feature) keyed by
+document and run, with indexes on the columns the query view filters on, so
+questions such as "all documents mentioning entity X with negative
+sentiment" or "top categories this week" are answered locally instead of
+calling Watson again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from nlu_analyzer.pipeline import flatten_relations
+
+DEFAULT_STORE_PATH = os.path.join(".nlu_cache", "analyses.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    features TEXT NOT NULL,
+    language TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    doc_id TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+    language TEXT,
+    characters INTEGER,
+    words INTEGER,
+    response BLOB NOT NULL,
+    UNIQUE (run_id, doc_id)
+);
+CREATE TABLE IF NOT EXISTS keywords (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    text TEXT NOT NULL, relevance REAL, count INTEGER, sentiment REAL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    text TEXT NOT NULL, type TEXT, relevance REAL, count INTEGER, sentiment REAL
+);
+CREATE TABLE IF NOT EXISTS concepts (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    text TEXT NOT NULL, relevance REAL, dbpedia_resource TEXT
+);
+CREATE TABLE IF NOT EXISTS categories (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    label TEXT NOT NULL, score REAL
+);
+CREATE TABLE IF NOT EXISTS relations (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    type TEXT, elements TEXT, sentence TEXT, score REAL
+);
+CREATE INDEX IF NOT EXISTS documents_analyzed_at ON documents (analyzed_at);
+CREATE INDEX IF NOT EXISTS documents_doc_id ON documents (doc_id);
+CREATE INDEX IF NOT EXISTS keywords_text ON keywords (text COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS keywords_document ON keywords (document_id);
+CREATE INDEX IF NOT EXISTS entities_text_type ON entities (text COLLATE NOCASE, type);
+CREATE INDEX IF NOT EXISTS entities_type ON entities (type);
+CREATE INDEX IF NOT EXISTS entities_document ON entities (document_id);
+CREATE INDEX IF NOT EXISTS concepts_document ON concepts (document_id);
+CREATE INDEX IF NOT EXISTS categories_label ON categories (label);
+CREATE INDEX IF NOT EXISTS categories_document ON categories (document_id);
+CREATE INDEX IF NOT EXISTS relations_document ON relations (document_id);
+"""
+
+
+def _sentiment(item):
+    sentiment = item.get("sentiment")
+    return sentiment.get("score") if isinstance(sentiment, dict) else None
+
+
+class AnalysisStore:
+    """SQLite-backed store of analyzed documents, safe to share between threads."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA foreign_keys = ON")
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.executescript(_SCHEMA)
+
+    def start_run(self, features, language=None):
+        """Record a new run (one click of Analyze or one CLI job) and return its id."""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO runs (created_at, features, language) VALUES (?, ?, ?)",
+                (time.time(), json.dumps(features, sort_keys=True), language)
+            )
+            return cursor.lastrowid
+
+    def save(self, run_id, doc_id, response, statistics=None):
+        """Store one response, replacing an earlier one for the same run and document."""
+        statistics = statistics or {}
+        body = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM documents WHERE run_id = ? AND doc_id = ?", (run_id, doc_id))
+            document_id = self._db.execute(
+                "INSERT INTO documents (run_id, doc_id, analyzed_at, language, characters, words, response) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, doc_id, time.time(), response.get("language"), statistics.get("characters"),
+                 statistics.get("words"), body)
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO keywords VALUES (?, ?, ?, ?, ?)",
+                [(document_id, kw.get("text"), kw.get("relevance"), kw.get("count"), _sentiment(kw))
+                 for kw in response.get("keywords", [])]
+            )
+            self._db.executemany(
+                "INSERT INTO entities VALUES (?, ?, ?, ?, ?, ?)",
+                [(document_id, ent.get("text"), ent.get("type"), ent.get("relevance"), ent.get("count"),
+                  _sentiment(ent)) for ent in response.get("entities", [])]
+            )
+            self._db.executemany(
+                "INSERT INTO concepts VALUES (?, ?, ?, ?)",
+                [(document_id, concept.get("text"), concept.get("relevance"), concept.get("dbpedia_resource"))
+                 for concept in response.get("concepts", [])]
+            )
+            self._db.executemany(
+                "INSERT INTO categories VALUES (?, ?, ?)",
+                [(document_id, category.get("label"), category.get("score"))
+                 for category in response.get("categories", [])]
+            )
+            self._db.executemany(
+                "INSERT INTO relations VALUES (?, ?, ?, ?, ?)",
+                [(document_id, row["Relation Type"], row["Elements"], row["Sentence"], row["Confidence"])
+                 for row in flatten_relations(response.get("relations", []))]
+            )
+            return document_id
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def documents_mentioning(self, entity, entity_type=None, max_sentiment=None, since=None, limit=1000):
+        """Documents whose entities include ``entity`` (case-insensitive), newest first.
+
+        ``max_sentiment`` keeps only mentions with a sentiment score below it
+        and ``since`` (a Unix timestamp) only documents analyzed after it.
+        """
+        sql = ("SELECT d.doc_id, d.analyzed_at, e.text, e.type, e.relevance, e.count, e.sentiment "
+               "FROM entities e JOIN documents d ON d.id = e.document_id "
+               "WHERE e.text = ? COLLATE NOCASE")
+        params = [entity]
+        if entity_type:
+            sql += " AND e.type = ?"
+            params.append(entity_type)
+        if max_sentiment is not None:
+            sql += " AND e.sentiment < ?"
+            params.append(max_sentiment)
+        if since is not None:
+            sql += " AND d.analyzed_at >= ?"
+            params.append(since)
+        sql += " ORDER BY d.analyzed_at DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def top_categories(self, since=None, limit=20):
+        """Categories ranked by the number of documents they were assigned to."""
+        return self._top("categories", "label", "score", since, limit)
+
+    def top_entities(self, since=None, limit=20, entity_type=None):
+        """Entities ranked by the number of documents mentioning them."""
+        return self._top("entities", "text", "relevance", since, limit, entity_type)
+
+    def top_keywords(self, since=None, limit=20):
+        """Keywords ranked by the number of documents they were extracted from."""
+        return self._top("keywords", "text", "relevance", since, limit)
+
+    def _top(self, table, column, score, since, limit, entity_type=None):
+        sql = (f"SELECT t.{column} AS {column}, COUNT(DISTINCT t.document_id) AS documents, "
+               f"AVG(t.{score}) AS avg_{score} "
+               f"FROM {table} t JOIN documents d ON d.id = t.document_id WHERE 1 = 1")
+        params = []
+        if since is not None:
+            sql += " AND d.analyzed_at >= ?"
+            params.append(since)
+        if entity_type:
+            sql += " AND t.type = ?"
+            params.append(entity_type)
+        sql += f" GROUP BY t.{column} ORDER BY documents DESC, avg_{score} DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def response(self, doc_id):
+        """Return the most recent stored response for ``doc_id``, or ``None``."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM documents WHERE doc_id = ? ORDER BY analyzed_at DESC LIMIT 1", (doc_id,)
+            ).fetchone()
+        return json.loads(zlib.decompress(row["response"]).decode("utf-8")) if row else None
+
+    def iter_responses(self, batch_size=500):
+        """Yield ``(analyzed_at, response)`` for every stored document, oldest first, a page at a time."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, analyzed_at, response FROM documents WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row["analyzed_at"], json.loads(zlib.decompress(row["response"]).decode("utf-8"))
+            last_id = rows[-1]["id"]
+
+    def counts(self):
+        """Number of runs and stored documents."""
+        with self._lock:
+            runs = self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"runs": runs, "documents": documents}
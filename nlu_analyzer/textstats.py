@@ -0,0 +1,251 @@
+"""Streaming, language-aware text statistics.
+
+The text is read once, piece by piece, and each piece is scanned by three
+regular expressions: words are found with one and tallied in a ``Counter``
+(for unique terms and syllables); sentence terminators and paragraph breaks
+are found by the other two, where sentence ends are decided:
+
+- periods after titles and similar abbreviations ("Dr.", "z.B.") do not end
+  a sentence; after "No."/"Nr." only when a number follows. Abbreviations
+  that often close a sentence ("etc.", "Corp.", "a.m.") and single letters
+  end one when a capital letter follows, unless the letter looks like an
+  initial ("John F. Kennedy", "J. R. Tolkien"); decimals such as "3.14"
+  are one word;
+- "!", "?", "…" and the CJK and Arabic terminators always end one;
+- Chinese and Japanese text has no spaces, so every ideograph or kana counts
+  as a word (Korean separates words with spaces and is counted like Latin
+  scripts).
+
+``TextStatistics`` is incremental: feed it the pieces of a stream and it
+carries the unfinished word at each boundary over to the next piece.
+Reading ease uses the Flesch formula adapted to the language (Amstad for
+German, Fernández Huerta for Spanish, Kandel-Moles for French, Franchini for
+Italian, Douma for Dutch, Martins for Portuguese); there is no syllable-based
+score for Arabic, Japanese, Korean or Chinese.
+"""
+import re
+from collections import Counter
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿"
+_WORD_RE = re.compile(r"\w+(?:['’.\-]\w+)*")
+# Ideographs and kana are one word each
+_CJK_WORD_RE = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+(?:['’.\-][^\W{_CJK}]+)*")
+# A period inside a word ("3.14", "U.S") is not a terminator
+_END_RE = re.compile(r"(?:[!?…。！？؟]|\.(?!\w))+")
+_OPENING = "\"'([{“‘«¿¡"
+_PARAGRAPH_RE = re.compile(r"\n[^\S\n]*\n")
+_ANY_WORD_RE = re.compile(r"\w")
+# What may continue in the next piece: trailing whitespace and a partial word, and
+# a word ending in a period before them (whether it ends a sentence depends on what
+# follows); ideographs and kana are words on their own, so unspaced CJK text is
+# never held back. Matched at the start of the reversed text, so only the tail is read
+_TRAILING_RE = re.compile(rf"[^\s{_CJK}]*\s*(?:\.[^\s{_CJK}]*)?")
+_NEXT_RE = re.compile(r"\s*(\S)")
+# Another initial ("R." in "J. R. Tolkien") right after a period
+_NEXT_INITIAL_RE = re.compile(r"\s+[^\W\d_]\.")
+_VOWELS_RE = re.compile(r"[aeiouyàáâãäåæèéêëìíîïòóôõöøœùúûüý]+")
+_DIGITS_RE = re.compile(r"\d")
+
+# Beyond this a run without spaces (say, an embedded base64 blob) is scanned
+# as is rather than carried over again and again
+MAX_CARRY = 65536
+
+# Lower-cased abbreviations whose trailing period never ends a sentence (the
+# period itself is not part of the word token): titles before a name and
+# abbreviations used mid-sentence. German capitalizes nouns, so a capital
+# letter after an abbreviation says little there
+ABBREVIATIONS = {
+    "en": {"mr", "mrs", "ms", "dr", "prof", "st", "mt", "vs", "e.g", "i.e"},
+    "de": {"z.b", "bzw", "ca", "dr", "prof", "evtl", "ggf", "d.h", "u.a", "vgl", "bspw", "inkl", "hr", "fr"},
+    "es": {"sr", "sra", "srta", "dr", "dra", "ud", "uds", "p.ej", "av"},
+    "fr": {"m", "mm", "mme", "mlle", "dr", "pr", "p.ex", "av", "bd", "cf", "st", "ste"},
+    "it": {"sig", "sigg", "sig.ra", "dott", "prof", "ing", "avv", "cfr"},
+    "nl": {"dhr", "mevr", "dr", "prof", "bijv", "o.a", "d.w.z", "m.b.t", "ca"},
+    "pt": {"sr", "sra", "dr", "dra", "prof", "p.ex", "av"},
+}
+
+# Abbreviations that only continue the sentence when a number follows ("No. 5")
+NUMBER_ABBREVIATIONS = {
+    "en": {"no", "fig"},
+    "de": {"nr", "s"},
+    "es": {"pág", "núm"},
+    "fr": set(),
+    "it": {"pag", "n"},
+    "nl": {"nr", "blz"},
+    "pt": {"pág", "nº"},
+}
+
+# Abbreviations that end a sentence when a capital letter (or the end of the
+# text) follows, like single letters that are not initials
+FINAL_ABBREVIATIONS = {
+    "en": {"sr", "jr", "etc", "inc", "ltd", "co", "corp", "approx", "dept", "est", "jan", "feb", "mar", "apr",
+           "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "u.s", "u.k", "a.m", "p.m"},
+    "de": {"usw", "str", "jh"},
+    "es": {"etc", "cía", "dto"},
+    "fr": {"etc", "env"},
+    "it": {"ecc", "es", "s.p.a"},
+    "nl": {"enz"},
+    "pt": {"etc", "ltda", "s.a"},
+}
+
+
+def _flesch(language, words_per_sentence, syllables_per_word):
+    if language == "de":
+        return 180 - words_per_sentence - 58.5 * syllables_per_word
+    if language == "es":
+        return 206.84 - 60 * syllables_per_word - 1.02 * words_per_sentence
+    if language == "fr":
+        return 207 - 1.015 * words_per_sentence - 73.6 * syllables_per_word
+    if language == "it":
+        return 217 - 1.3 * words_per_sentence - 60 * syllables_per_word
+    if language == "nl":
+        return 206.835 - 0.93 * words_per_sentence - 77 * syllables_per_word
+    if language == "pt":
+        return 248.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+    return 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+
+
+def syllables(word, language="en"):
+    """Estimate the syllables of a lower-cased word from its vowel groups."""
+    if _DIGITS_RE.search(word):
+        return 1
+    count = len(_VOWELS_RE.findall(word))
+    # A silent final "e" ("make", "phase") in English
+    if language == "en" and word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+class TextStatistics:
+    """Accumulates statistics over consecutive pieces of one text (``update``), read via ``statistics``."""
+
+    def __init__(self, language=None):
+        self.language = language
+        self.abbreviations = ABBREVIATIONS.get(language or "en", set())
+        self.number_abbreviations = NUMBER_ABBREVIATIONS.get(language or "en", set())
+        self.final_abbreviations = FINAL_ABBREVIATIONS.get(language or "en", set())
+        self._abbreviated = self.abbreviations | self.number_abbreviations | self.final_abbreviations
+        self.characters = 0
+        self.words = 0
+        self.sentences = 0
+        self.paragraphs = 0
+        self.terms = Counter()
+        self._cjk = language in (None, "ja", "zh")
+        self._carry = ""
+        # Last word of the text scanned so far, for the word before an initial
+        self._last_word = ""
+        self._open_sentence = False
+        self._open_paragraph = False
+
+    def update(self, piece):
+        """Add the next piece of the text."""
+        if not piece:
+            return
+        self.characters += len(piece)
+        text = self._carry + piece
+        # Hold back the trailing whitespace and partial word: they may continue in the next piece
+        cut = len(text) - _TRAILING_RE.match(text[::-1]).end()
+        if len(text) - cut > MAX_CARRY:
+            cut = len(text)
+        self._carry = text[cut:]
+        self._scan(text[:cut])
+
+    def _scan(self, text):
+        # Words go through findall and Counter in one go; only terminators and
+        # paragraph breaks are looked at one by one
+        words = (_CJK_WORD_RE if self._cjk else _WORD_RE).findall(text.lower())
+        self.terms.update(words)
+        self.words += len(words)
+
+        open_sentence = self._open_sentence
+        previous = 0
+        for match in _END_RE.finditer(text):
+            start = match.start()
+            end = match.end()
+            if end == start + 1 and text[start] == "." and start and not text[start - 1].isspace():
+                # The word the period ends ("Dr", "z.B", an initial)
+                word = text[max(0, start - 16):start].rsplit(None, 1)[-1].lstrip(_OPENING).lower()
+                if (word in self._abbreviated or (len(word) == 1 and word.isalpha())) and \
+                        self._continues(text, start, end, word):
+                    continue
+            # Usually a word ends right at the terminator, which spares the search
+            if open_sentence or (start > previous and text[start - 1].isalnum()) or \
+                    _ANY_WORD_RE.search(text, previous, start):
+                self.sentences += 1
+            open_sentence = False
+            previous = end
+        self._open_sentence = open_sentence or _ANY_WORD_RE.search(text, previous) is not None
+
+        open_paragraph = self._open_paragraph
+        previous = 0
+        for match in _PARAGRAPH_RE.finditer(text):
+            if open_paragraph or _ANY_WORD_RE.search(text, previous, match.start()):
+                self.paragraphs += 1
+            open_paragraph = False
+            previous = match.end()
+        self._open_paragraph = open_paragraph or _ANY_WORD_RE.search(text, previous) is not None
+        last_words = text[-32:].rsplit(None, 1)
+        if last_words:
+            self._last_word = last_words[-1]
+
+    def _continues(self, text, start, end, word):
+        """Whether the period at ``start``, after the abbreviation or letter ``word``, is within the sentence."""
+        if word in self.abbreviations:
+            return True
+        # What follows, which may already be held back for the next piece
+        ahead = text[end:end + 32]
+        if len(ahead) < 32:
+            ahead += self._carry[:32]
+        following = _NEXT_RE.match(ahead)
+        following = following.group(1) if following else ""
+        if word in self.number_abbreviations:
+            return following.isdigit()
+        single = len(word) == 1 and word.isalpha()
+        if not (single or word in self.final_abbreviations):
+            return False
+        if not following.isupper():
+            # Lower case, a digit or punctuation goes on; so does the end of the text, for
+            # an unterminated last sentence is counted anyway
+            return True
+        # A capital letter: a new sentence, unless this is an initial of a name
+        if not (single and text[start - 1].isupper()):
+            return False
+        before = text[max(0, start - 32):start].rsplit(None, 2)
+        previous = before[-2] if len(before) > 1 else self._last_word if start < 32 else ""
+        return (_NEXT_INITIAL_RE.match(ahead) is not None or previous[:1].isupper()
+                or (len(previous) == 2 and previous.endswith(".")))
+
+    @property
+    def statistics(self):
+        """Statistics of the whole text; read it once all pieces are added (an unterminated last sentence counts)."""
+        if self._carry:
+            carry, self._carry = self._carry, ""
+            self._scan(carry)
+        sentences = self.sentences + (1 if self._open_sentence else 0)
+        paragraphs = self.paragraphs + (1 if self._open_paragraph else 0)
+        statistics = {
+            "words": self.words,
+            "sentences": sentences,
+            "characters": self.characters,
+            "paragraphs": paragraphs,
+            "unique_terms": len(self.terms),
+            "avg_sentence_length": round(self.words / sentences, 2) if sentences else 0.0,
+            "reading_ease": None,
+            "grade_level": None,
+        }
+        counted = sum(self.terms.values())
+        if sentences and counted and self.language not in ("ar", "ja", "ko", "zh"):
+            language = self.language or "en"
+            syllables_per_word = sum(syllables(term, language) * n for term, n in self.terms.items()) / counted
+            words_per_sentence = self.words / sentences
+            statistics["reading_ease"] = round(_flesch(language, words_per_sentence, syllables_per_word), 1)
+            if language == "en":
+                statistics["grade_level"] = round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 1)
+        return statistics
+
+
+def text_statistics(text, language=None):
+    """Return the statistics shown in TEXT STATISTICS for a whole text."""
+    statistics = TextStatistics(language)
+    statistics.update(text)
+    return statistics.statistics
@@ -0,0 +1,28 @@
+import threading
+import unittest
+
+from nlu_analyzer.jobs import BatchJobs, JobQueue
+
+
+class QuotaCountersTest(unittest.TestCase):
+    def test_held_back_document_is_rejected_once(self):
+        queue = JobQueue(workers=1, max_queued_per_user=1)
+        release = threading.Event()
+        batch = BatchJobs(queue, "user", lambda text: release.wait(5) and text,
+                          [("a", "first"), ("b", "second")])
+        for _ in range(5):
+            batch.poll()
+        self.assertEqual(queue.stats()["rejected"], 1)
+        release.set()
+        results = []
+        while not batch.done:
+            results.extend(batch.poll())
+            threading.Event().wait(0.01)
+        self.assertEqual(sorted((result.doc_id, result.response) for result in results),
+                         [("a", "first"), ("b", "second")])
+        stats = queue.stats()
+        self.assertEqual((stats["submitted"], stats["rejected"], stats["completed"]), (2, 1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from nlu_analyzer.scheduler import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RequestScheduler
+
+
+class HalfOpenProbeTest(unittest.TestCase):
+    def half_open_scheduler(self, **options):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        breaker.record_failure()
+        return RequestScheduler(breaker=breaker, **options)
+
+    def test_deadline_expiring_in_rate_limit_wait_releases_probe(self):
+        scheduler = self.half_open_scheduler(rate=1.0)
+        scheduler.bucket.acquire()
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.call(lambda: "sent", deadline=0.1)
+        self.assertEqual(scheduler.breaker.state, "half-open")
+        self.assertEqual(scheduler.call(lambda: "sent", deadline=5.0), "sent")
+        self.assertEqual(scheduler.breaker.state, "closed")
+
+    def test_deadline_expired_before_sending_releases_probe(self):
+        scheduler = self.half_open_scheduler(rate=None)
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.call(lambda timeout: "sent", deadline=1e-9, timeout_argument="timeout")
+        self.assertEqual(scheduler.call(lambda timeout: "sent", timeout_argument="timeout"), "sent")
+
+    def test_concurrent_probe_is_still_refused(self):
+        scheduler = self.half_open_scheduler(rate=None)
+        self.assertTrue(scheduler.breaker.allow())
+        with self.assertRaises(CircuitOpenError):
+            scheduler.call(lambda: "sent")
+
+
+if __name__ == "__main__":
+    unittest.main()